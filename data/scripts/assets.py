@@ -0,0 +1,87 @@
+import pygame, threading, glob, time
+from . import fonts
+from .logger import log, INFO, WARNING
+
+# every image is decoded once and shared, nobody draws on them. decoded holds what the preloader read
+# but didn't convert yet, converting needs the display and happens on the thread that asks for the image
+images = {}
+decoded = {}
+lock = threading.Lock()
+
+
+def load_image(path):
+    with lock:
+        image = images.get(path)
+        if image is not None:
+            return image
+        image = decoded.pop(path, None)
+
+    if image is None:
+        image = pygame.image.load(path)
+
+    # without a window (dedicated server) there is no pixel format to convert to
+    if pygame.display.get_surface() is not None:
+        image = image.convert_alpha()
+
+    with lock:
+        return images.setdefault(path, image)
+
+
+def load_animation(path, length):
+    animation = []
+    for i in range(length):
+        image = load_image(f'{path}{i+1}.png')
+        animation.append(image)
+    return animation
+
+
+class Preloader:
+    def __init__(self, paths, fonts=()):
+        # image paths to decode and (path, size) of the fonts to open, all on a worker thread
+        self.paths = [p for p in paths if p not in images]
+        self.fonts = list(fonts)
+        self.total = len(self.paths) + len(self.fonts)
+        self.loaded = 0
+        self.failed = []
+
+        self.thread = threading.Thread(target=self.load, name='assets', daemon=True)
+        self.thread.start()
+
+    def load(self):
+        start = time.perf_counter()
+        for path in self.paths:
+            try:
+                image = pygame.image.load(path)
+            except (pygame.error, FileNotFoundError) as e:
+                self.failed.append(path)
+                log(f'could not preload {path}', WARNING)
+                log(e, WARNING)
+            else:
+                with lock:
+                    if path not in images:
+                        decoded[path] = image
+            self.loaded += 1
+
+        for path, size in self.fonts:
+            fonts.get(path, size)
+            self.loaded += 1
+
+        log(f'preloaded {self.loaded} assets in {(time.perf_counter() - start) * 1000:.0f} ms', INFO)
+
+    def progress(self):
+        return self.loaded / self.total if self.total else 1
+
+    @property
+    def done(self):
+        return self.loaded >= self.total
+
+
+preloader = None
+
+
+def preload():
+    # everything a match needs, started by the main menu so hosting or joining doesn't wait on the disk
+    global preloader
+    if preloader is None:
+        preloader = Preloader(sorted(glob.glob('data/sprites/**/*.png', recursive=True)), [('data/font/font.ttf', 10), ('data/font/font.ttf', 15), ('data/font/font.ttf', 20), ('data/font/font.ttf', 30)])
+    return preloader
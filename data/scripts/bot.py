@@ -0,0 +1,241 @@
+import threading, json, math, random, time
+from . import connection
+from socket import AF_INET, socket, SOCK_STREAM
+
+
+class Bot:
+    def __init__(self, address, name, team=None, compression=True, match=None):
+        self.address = address
+        self.name = name
+
+        self.sock = socket(AF_INET, SOCK_STREAM)
+        self.sock.connect(self.address)
+
+        hello = {'compression': connection.COMPRESSION_METHODS if compression else []}
+        if match:
+            hello['match'] = match
+        self.sock.sendall(bytes(json.dumps(hello), 'utf8'))
+
+        info = json.loads(connection.receive_handshake(self.sock))
+        self.message_splitter = info['message_splitter']
+        self.own_id = info['own_id']
+        self.team = team if team is not None else random.choice(info['teams'])
+
+        self.reader = connection.MessageReader(self.message_splitter)
+        self.lock = threading.Lock()
+
+        # pongs go out from the receive thread, everything else from the load test loop
+        self.send_lock = threading.Lock()
+        self.reset_stats()
+
+        self.center = (4 * 32, 3 * 32)
+        self.rotation = 0
+        self.angle = random.uniform(0, 2 * math.pi)
+        self.last_fire = time.time()
+        self.next_bullet_id = 0
+
+        # sent positions by the time they were sent, so the echo in a snapshot gives the round trip
+        self.sent_positions = {}
+
+        self.running = True
+        self.sock.sendall(self.build_message({'name': self.name, 'team': self.team}))
+
+        self.receive_thread = threading.Thread(target=self.receive, daemon=True)
+        self.receive_thread.start()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {
+                'bytes_in': 0,
+                'bytes_out': 0,
+                'messages_in': 0,
+                'messages_out': 0,
+                'garbled': 0,
+                'dropped': 0,
+                'ticks': 0,
+                'tick_time': 0,
+                'max_tick_time': 0,
+                'latencies': []
+            }
+            self.last_tick = None
+
+    def take_stats(self):
+        with self.lock:
+            stats = self.stats
+        self.reset_stats()
+        return stats
+
+    def update(self, fire_interval):
+        # walk in a circle around the spawn, the host does not check collisions anyway
+        self.angle += .05
+        self.center = (4 * 32 + math.cos(self.angle) * 40, 3 * 32 + math.sin(self.angle) * 40 + 40)
+        self.rotation = math.degrees(self.angle) % 360
+
+        bullets = []
+        now = time.time()
+        if fire_interval and now - self.last_fire >= fire_interval:
+            self.last_fire = now
+            direction = (math.cos(self.angle), math.sin(self.angle))
+            bullets.append([self.next_bullet_id, direction, (self.center[0] + direction[0] * 30, self.center[1] + direction[1] * 30), 30, 1])
+
+        info = {
+            'player': {
+                'center': self.center,
+                'rotation': self.rotation,
+                'weapon': 'pistol',
+                'frame': 1 if bullets else 0,
+                'bullets': bullets
+            }
+        }
+        self.next_bullet_id += len(bullets)
+
+        # stored before sending, a fast echo must find it. the receive thread pops from it under the lock
+        with self.lock:
+            self.sent_positions[self.center] = now
+
+            # positions that never came back are counted by the dropped snapshots already
+            if len(self.sent_positions) > 512:
+                for position in list(self.sent_positions)[:256]:
+                    self.sent_positions.pop(position, None)
+
+        self.send(self.build_message(info))
+
+    def send(self, message: bytes):
+        try:
+            with self.send_lock:
+                self.sock.sendall(message)
+        except OSError:
+            self.running = False
+            return
+
+        with self.lock:
+            self.stats['bytes_out'] += len(message)
+            self.stats['messages_out'] += 1
+
+    def receive(self):
+        while self.running:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                break
+
+            if data == b'':
+                break
+
+            with self.lock:
+                self.stats['bytes_in'] += len(data)
+
+            for message in self.reader.feed(data):
+                self.handle_message(message)
+
+        self.running = False
+
+    def handle_message(self, message: bytes):
+        now = time.time()
+        try:
+            info = json.loads(message)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            with self.lock:
+                self.stats['garbled'] += 1
+            return
+
+        if 'ping' in info:
+            self.send(self.build_message({'pong': info['ping']}))
+
+        with self.lock:
+            self.stats['messages_in'] += 1
+
+            if 'players' in info:
+                if 'tick' in info:
+                    if self.last_tick is not None and info['tick'] > self.last_tick[0]:
+                        ticks = info['tick'] - self.last_tick[0]
+                        tick_time = (info['time'] - self.last_tick[1]) / ticks
+                        self.stats['dropped'] += ticks - 1
+                        self.stats['ticks'] += ticks
+                        self.stats['tick_time'] += tick_time * ticks
+                        self.stats['max_tick_time'] = max(self.stats['max_tick_time'], tick_time)
+                    self.last_tick = (info['tick'], info['time'])
+
+                for p in info['players']:
+                    if p[0] == self.own_id and p[1] is not None:
+                        sent = self.sent_positions.pop(tuple(p[1]), None)
+                        if sent is not None:
+                            self.stats['latencies'].append(now - sent)
+
+    def build_message(self, message: dict):
+        return bytes(json.dumps(message) + self.message_splitter, 'utf8')
+
+    def stop(self):
+        self.running = False
+        try:
+            with self.send_lock:
+                self.sock.sendall(bytes('{quit}', 'utf8'))
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class LoadTest:
+    def __init__(self, address, max_bots=32, step=4, stage_duration=10, send_rate=60, fire_interval=.5, compression=True, match=None):
+        self.address = address
+        self.max_bots = max_bots
+        self.step = step
+        self.stage_duration = stage_duration
+        self.send_rate = send_rate
+        self.fire_interval = fire_interval
+        self.compression = compression
+        self.match = match
+
+        self.bots = []
+
+    def run(self):
+        print('bots  tick ms (avg/max)  latency ms (avg/p95)  in kB/s  out kB/s  msgs in/s  dropped  garbled  lost bots')
+
+        try:
+            while len(self.bots) < self.max_bots:
+                for _ in range(min(self.step, self.max_bots - len(self.bots))):
+                    self.bots.append(Bot(self.address, f'bot {len(self.bots)}', compression=self.compression, match=self.match))
+
+                self.run_stage()
+        finally:
+            for b in self.bots:
+                b.stop()
+
+    def run_stage(self):
+        for b in self.bots:
+            b.take_stats()
+
+        start = time.time()
+        next_send = start
+        while time.time() - start < self.stage_duration:
+            for b in self.bots:
+                if b.running:
+                    b.update(self.fire_interval)
+
+            next_send += 1 / self.send_rate
+            delay = next_send - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_send = time.time()
+
+        duration = time.time() - start
+        self.report([b.take_stats() for b in self.bots], duration)
+
+    def report(self, stats, duration):
+        ticks = sum(s['ticks'] for s in stats)
+        tick_time = sum(s['tick_time'] for s in stats) / ticks if ticks else 0
+        max_tick_time = max((s['max_tick_time'] for s in stats), default=0)
+
+        latencies = sorted(latency for s in stats for latency in s['latencies'])
+        latency = sum(latencies) / len(latencies) if latencies else 0
+        latency_p95 = latencies[int(len(latencies) * .95)] if latencies else 0
+
+        bytes_in = sum(s['bytes_in'] for s in stats) / duration / 1024
+        bytes_out = sum(s['bytes_out'] for s in stats) / duration / 1024
+        messages_in = sum(s['messages_in'] for s in stats) / duration
+        dropped = sum(s['dropped'] for s in stats)
+        garbled = sum(s['garbled'] for s in stats)
+        lost = sum(not b.running for b in self.bots)
+
+        print(f'{len(self.bots):4}  {tick_time * 1000:7.2f} / {max_tick_time * 1000:7.2f}  {latency * 1000:8.2f} / {latency_p95 * 1000:8.2f}  {bytes_in:7.1f}  {bytes_out:8.1f}  {messages_in:9.1f}  {dropped:7}  {garbled:7}  {lost:9}')
@@ -1,13 +1,9 @@
 import pygame
 import time
+from . import ecs
+from .assets import load_animation
 
-
-def load_animation(path, length):
-    animation = []
-    for i in range(length):
-        image = pygame.image.load(f'{path}{i+1}.png').convert_alpha()
-        animation.append(image)
-    return animation
+np = ecs.np
 
 
 def to_renderer_position(pos):
@@ -16,54 +12,139 @@ def to_renderer_position(pos):
     return new_x, new_y
 
 
-class Bullet:
-    def __init__(self, direction, center, speed, damage, map):
-        self.one_direction = direction
-        self.direction = (direction[0] * speed, direction[1] * speed)
-        self.center = center
-        self.map = map
-        self.damage = damage
-
-        self.dead = False
-        self.collided = False
+class Bullets(ecs.Store):
+    # every bullet of every player, flying or playing its impact animation, keyed by (owner, bullet id).
+    # owners are player ids and the bullet ids are handed out by the player who shot them
+    def __init__(self, map):
+        ecs.Store.__init__(self, {
+            'owner': (np.int64, ()),
+            'center': (np.float64, (2,)),
+            'direction': (np.float64, (2,)),
+            'velocity': (np.float64, (2,)),
+            'damage': (np.float64, ()),
+            'last_time': (np.float64, ()),
+            'collided': (np.bool_, ()),
+            'frame': (np.int64, ()),
+            'animation_count': (np.float64, ())
+        })
 
-        self.last_time = time.time()
-        self.dt = 1
+        self.map = map
 
         self.frames = load_animation('data/sprites/animations/bullet_', 3)
+        self.width, self.height = self.frames[0].get_size()
+        # only flying bullets hit anybody, so only the first frame needs a mask
+        self.mask = pygame.mask.from_surface(self.frames[0])
 
-        self.frame = 0
         self.animation_change = 10
-        self.animation_count = 0
-        self.image = self.frames[self.frame]
-        self.rect = self.image.get_rect(center=self.center)
-        self.mask = pygame.mask.from_surface(self.image)
+        self.max_step = 33
+
+        # wall rects as left, top, right, bottom, to test every bullet against every wall at once
+        self.walls = np.array([(w.rect.left, w.rect.top, w.rect.right, w.rect.bottom) for w in self.map.walls], np.float64).reshape(-1, 4)
+
+        # bullets fired in this process that still have to be sent, by owner
+        self.spawned = {}
+
+    def add_bullet(self, owner, bullet_id, direction, center, speed, damage, new=False):
+        self.add(
+            (owner, bullet_id),
+            owner=owner,
+            center=center,
+            direction=direction,
+            velocity=(direction[0] * speed, direction[1] * speed),
+            damage=damage,
+            last_time=time.time()
+        )
+
+        if new:
+            self.spawned.setdefault(owner, []).append([bullet_id, direction, center, speed, damage])
+
+    def take_spawned(self, owner):
+        return self.spawned.pop(owner, [])
+
+    def remove_owner(self, owner):
+        self.remove_rows(self.owned_by(owner))
+        self.spawned.pop(owner, None)
+
+    def clear(self):
+        ecs.Store.clear(self)
+        self.spawned = {}
+
+    def owned_by(self, owner):
+        return np.flatnonzero(self['owner'] == owner)
+
+    def not_owned_by(self, owner):
+        return np.flatnonzero(self['owner'] != owner)
+
+    def damaging(self):
+        # (row, key, top left, damage) of every flying bullet that does damage, for hit detection
+        rows = np.flatnonzero((self['damage'] != 0) & ~self['collided'])
+        return list(zip(rows.tolist(), [self.keys[row] for row in rows.tolist()], self.topleft(rows).astype(int).tolist(), self['damage'][rows].tolist()))
+
+    def topleft(self, rows=None):
+        # like Rect.center = center, which rounds halves away from zero
+        center = self['center'] if rows is None else self['center'][rows]
+        rounded = np.trunc(center + np.copysign(.5, center))
+        return rounded - (self.width // 2, self.height // 2)
 
     def update(self):
-        self.dt = time.time() - self.last_time
-        self.dt *= 120
-        self.last_time = time.time()
-
-        if not self.collided:
-            self.center = (self.center[0] + min(self.direction[0] * self.dt, 33), self.center[1] + min(self.direction[1] * self.dt, 33))
-            self.rect.center = self.center
-
-            for wall in self.map.walls:
-                if self.rect.colliderect(wall.rect):
-                    while wall.rect.collidepoint(self.center):
-                        self.center = (self.center[0] - self.one_direction[0] * self.dt, self.center[1] - self.one_direction[1] * self.dt)
-                    self.rect.center = self.center
-                    self.collided = True
-                    break
-        else:
-            if self.animation_count >= self.animation_change:
-                self.frame += 1
-                self.animation_count = 0
-                if self.frame == len(self.frames):
-                    self.dead = True
-                else:
-                    self.image = self.frames[self.frame]
-            self.animation_count += self.dt
-
-    def render(self, surface: pygame.Surface):
-        surface.blit(self.image, self.rect)
+        if not self.count:
+            return
+
+        now = time.time()
+        dt = (now - self['last_time']) * 120
+        self['last_time'][:] = now
+
+        # bullets that hit a wall this frame start their animation with the next one
+        collided = self['collided'].copy()
+        flying = np.flatnonzero(~collided)
+
+        self.move(flying, dt)
+        self.collide(flying, dt)
+        self.animate(collided, dt)
+
+    def move(self, rows, dt):
+        self['center'][rows] += np.minimum(self['velocity'][rows] * dt[rows, None], self.max_step)
+
+    def collide(self, rows, dt):
+        if not len(rows) or not len(self.walls):
+            return
+
+        left, top = self.topleft(rows).T
+        hits = (
+            (left[:, None] < self.walls[:, 2]) & (left[:, None] + self.width > self.walls[:, 0]) &
+            (top[:, None] < self.walls[:, 3]) & (top[:, None] + self.height > self.walls[:, 1])
+        )
+
+        # few bullets hit a wall in the same frame, walking them back out of it is fine one by one
+        for i in np.flatnonzero(hits.any(axis=1)):
+            row = rows[i]
+            wall = self.map.walls[hits[i].argmax()].rect
+            center = tuple(self['center'][row])
+            direction = self['direction'][row]
+            while wall.collidepoint(center):
+                center = (center[0] - direction[0] * dt[row], center[1] - direction[1] * dt[row])
+
+            self['center'][row] = center
+            self['collided'][row] = True
+
+    def animate(self, collided, dt):
+        count = self['animation_count']
+        frame = self['frame']
+
+        advance = collided & (count >= self.animation_change)
+        frame[advance] += 1
+        count[advance] = 0
+        count[collided] += dt[collided]
+
+        self.remove_rows(np.flatnonzero(frame >= len(self.frames)))
+
+    def rect(self, row):
+        x, y = self.topleft([row])[0]
+        return pygame.Rect(int(x), int(y), self.width, self.height)
+
+    def rects(self, rows=None):
+        return [pygame.Rect(x, y, self.width, self.height) for x, y in self.topleft(rows).astype(int).tolist()]
+
+    def render(self, surface: pygame.Surface, rows=None):
+        frames = self['frame'] if rows is None else self['frame'][rows]
+        surface.blits([(self.frames[f], position) for f, position in zip(frames.tolist(), self.topleft(rows).astype(int).tolist())], False)
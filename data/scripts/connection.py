@@ -0,0 +1,260 @@
+import threading, struct, time, json, zlib
+from collections import deque
+from socket import SHUT_RDWR, timeout
+from .logger import log, INFO, WARNING, ERROR
+from .network_stats import NetworkStats
+
+# a compressed frame is this marker, the payload length and the zlib payload,
+# plain json never contains a null byte so both kinds can share one stream
+FRAME_MARKER = b'\x00'
+FRAME_HEADER = struct.Struct('>cI')
+
+# strings that show up in almost every message, zlib matches the end of the dictionary most cheaply
+COMPRESSION_DICTIONARY = b''.join([
+    b'{"name": "", "teams": [], "names": [], "map": "data/maps/map_1.csv", "message_splitter": ""}',
+    b'{"damage": [[{"disconnect": {"ping": ',
+    b', null, null, null, null, [], "knife", "rifle", "pistol", ',
+    b'{"players": [[, [, ], [[, [1.0, 0.0], [, ], 30, 1]], "pistol", 0, [], "], "tick": , "time": '
+])
+
+COMPRESSION_METHODS = ['zlib']
+
+
+class Compressor:
+    def __init__(self, threshold=256, level=6):
+        # small messages barely shrink and are not worth the cpu time
+        self.threshold = threshold
+        self.level = level
+
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.compressed_messages = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.seconds = 0
+
+    def compress(self, data: bytes):
+        frame = data
+        start = time.perf_counter()
+
+        if len(data) >= self.threshold:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=COMPRESSION_DICTIONARY)
+            payload = compressor.compress(data) + compressor.flush()
+            if len(payload) + FRAME_HEADER.size < len(data):
+                frame = FRAME_HEADER.pack(FRAME_MARKER, len(payload)) + payload
+
+        with self.lock:
+            self.messages += 1
+            self.compressed_messages += frame is not data
+            self.raw_bytes += len(data)
+            self.sent_bytes += len(frame)
+            self.seconds += time.perf_counter() - start
+
+        return frame
+
+    def stats(self):
+        with self.lock:
+            return {
+                'messages': self.messages,
+                'compressed_messages': self.compressed_messages,
+                'raw_bytes': self.raw_bytes,
+                'sent_bytes': self.sent_bytes,
+                'ratio': self.sent_bytes / self.raw_bytes if self.raw_bytes else 1,
+                'cpu_seconds': self.seconds
+            }
+
+
+def decompress(payload: bytes):
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS, zdict=COMPRESSION_DICTIONARY)
+    return decompressor.decompress(payload) + decompressor.flush()
+
+
+def receive_hello(sock, timeout_seconds=.5, buffer_size=1024):
+    # clients say hello before the handshake, older ones don't and just wait for it
+    sock.settimeout(timeout_seconds)
+    try:
+        return json.loads(sock.recv(buffer_size).decode('utf8'))
+    except (timeout, json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+    finally:
+        sock.settimeout(None)
+
+
+def send_handshake(sock, info: bytes, compressor=None):
+    sock.sendall(compressor.compress(info) if compressor else info)
+
+
+def receive_handshake(sock, buffer_size=4096):
+    # the handshake is the only message without a splitter, it is either one compressed frame or plain json
+    data = b''
+    while True:
+        chunk = sock.recv(buffer_size)
+        if chunk == b'':
+            raise ConnectionResetError('host closed the connection during the handshake')
+        data += chunk
+
+        if data[:1] == FRAME_MARKER:
+            if len(data) < FRAME_HEADER.size:
+                continue
+            _, length = FRAME_HEADER.unpack_from(data)
+            if len(data) < FRAME_HEADER.size + length:
+                continue
+            return decompress(data[FRAME_HEADER.size:FRAME_HEADER.size + length])
+
+        try:
+            json.loads(data)
+            return data
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+
+
+class Connection:
+    def __init__(self, sock, address, max_queue_size=64, compressor=None):
+        self.sock = sock
+        self.address = address
+
+        # only set when the client asked for compression in its hello
+        self.compressor = compressor
+
+        # every entry is (data, droppable), droppable messages are snapshots a newer one can replace
+        self.queue = deque()
+        self.max_queue_size = max_queue_size
+        self.condition = threading.Condition()
+
+        self.coalesced = 0
+        self.closed = False
+
+        self.stats = NetworkStats()
+
+        self.writer_thread = threading.Thread(target=self.write, daemon=True)
+        self.writer_thread.start()
+
+    def send(self, data: bytes, droppable=False):
+        with self.condition:
+            if self.closed:
+                return
+
+            if droppable:
+                for i, (_, queued_droppable) in enumerate(self.queue):
+                    if queued_droppable:
+                        del self.queue[i]
+                        self.coalesced += 1
+                        break
+
+            if len(self.queue) >= self.max_queue_size:
+                # nothing left we could throw away, this client can't keep up with the session
+                log(f'outbound queue of {self.address} is full, dropping the connection', WARNING)
+                self.close()
+                return
+
+            self.queue.append((data, droppable))
+            self.condition.notify()
+
+    def write(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+
+                if self.closed:
+                    return
+
+                data, _ = self.queue.popleft()
+
+            # compress on the writer thread so the game loop never pays for it
+            frame = self.compressor.compress(data) if self.compressor else data
+
+            try:
+                self.sock.sendall(frame)
+            except OSError as e:
+                if self.closed or isinstance(e, (BrokenPipeError, ConnectionResetError)):
+                    # the other side left, that's how a normal disconnect ends for the writer
+                    log(f'{self.address} closed the connection while sending', INFO)
+                else:
+                    log(f'error sending to {self.address}: {e}', ERROR)
+                self.close()
+                return
+
+            self.stats.sent(data, len(frame))
+
+    def depth(self):
+        return len(self.queue)
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify()
+
+        # wakes up the writer and the reader of this socket if they are stuck in a blocking call
+        try:
+            self.sock.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class MessageReader:
+    def __init__(self, message_splitter, stats=None):
+        self.message_splitter = bytes(message_splitter, 'utf8')
+        self.buffer = b''
+
+        # counts every complete message with the bytes it took on the wire
+        self.stats = stats
+
+        self.decompressed_messages = 0
+        self.decompression_seconds = 0
+        self.decode_errors = 0
+
+    def feed(self, data: bytes):
+        # tcp does not keep message borders, so keep the unfinished tail for the next call
+        self.buffer += data
+
+        messages = []
+        while self.buffer:
+            if self.buffer[:1] == FRAME_MARKER:
+                if len(self.buffer) < FRAME_HEADER.size:
+                    break
+
+                _, length = FRAME_HEADER.unpack_from(self.buffer)
+                end = FRAME_HEADER.size + length
+                if len(self.buffer) < end:
+                    break
+
+                payload = self.buffer[FRAME_HEADER.size:end]
+                self.buffer = self.buffer[end:]
+
+                start = time.perf_counter()
+                try:
+                    message = decompress(payload)
+                except zlib.error as e:
+                    log('could not decompress a frame', WARNING)
+                    log(e, WARNING)
+                    self.decode_errors += 1
+                    if self.stats:
+                        self.stats.decode_error()
+                    continue
+                self.decompression_seconds += time.perf_counter() - start
+                self.decompressed_messages += 1
+
+                if message.endswith(self.message_splitter):
+                    message = message[:-len(self.message_splitter)]
+                messages.append(message)
+
+                if self.stats:
+                    self.stats.received(message, end)
+
+            else:
+                index = self.buffer.find(self.message_splitter)
+                if index == -1:
+                    break
+
+                messages.append(self.buffer[:index])
+                self.buffer = self.buffer[index + len(self.message_splitter):]
+
+                if self.stats:
+                    self.stats.received(messages[-1], index + len(self.message_splitter))
+
+        return messages
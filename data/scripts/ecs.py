@@ -0,0 +1,78 @@
+from . import lazy
+
+np = lazy.module('numpy')
+
+
+class Store:
+    # entities are rows in one array per component. removing one moves the last row into its place,
+    # so the live rows always sit packed at the front and systems work on whole slices at once
+    def __init__(self, components, capacity=64):
+        # components by name as (dtype, shape of one entity's value)
+        self.components = components
+        self.capacity = capacity
+        self.count = 0
+
+        self.arrays = {name: np.zeros((capacity, *shape), dtype) for name, (dtype, shape) in components.items()}
+
+        # every row has a key like (owner, id), rows by key for lookups from the network
+        self.keys = []
+        self.rows = {}
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __getitem__(self, name):
+        # the live part of a component, a view, so systems can write to it directly
+        return self.arrays[name][:self.count]
+
+    def add(self, key, **values):
+        if key in self.rows:
+            self.remove(key)
+
+        if self.count == self.capacity:
+            self.grow()
+
+        row = self.count
+        for name, array in self.arrays.items():
+            array[row] = values.get(name, 0)
+
+        self.keys.append(key)
+        self.rows[key] = row
+        self.count += 1
+        return row
+
+    def grow(self):
+        self.capacity *= 2
+        for name, array in self.arrays.items():
+            bigger = np.zeros((self.capacity, *array.shape[1:]), array.dtype)
+            bigger[:self.count] = array[:self.count]
+            self.arrays[name] = bigger
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return False
+
+        last = self.count - 1
+        if row != last:
+            for array in self.arrays.values():
+                array[row] = array[last]
+            self.keys[row] = self.keys[last]
+            self.rows[self.keys[row]] = row
+
+        self.keys.pop()
+        self.count -= 1
+        return True
+
+    def remove_rows(self, rows):
+        # from the back, so moving the last row never touches one that still has to go
+        for row in sorted(rows, reverse=True):
+            self.remove(self.keys[row])
+
+    def clear(self):
+        self.count = 0
+        self.keys = []
+        self.rows = {}
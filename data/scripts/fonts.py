@@ -0,0 +1,64 @@
+import pygame, threading
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, font, max_surfaces=256):
+        self.font = font
+
+        # rendered strings by (text, color, background), the least recently used ones go first
+        self.surfaces = OrderedDict()
+        self.max_surfaces = max_surfaces
+
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, color, background=None):
+        # the result is shared, blit it somewhere but don't draw on it
+        key = (text, color, background)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.font.render(text, True, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+
+        return surface
+
+    def blit(self, surface, text, position, color, background=None):
+        return surface.blit(self.render(text, color, background), position)
+
+    def size(self, text):
+        return self.font.size(text)
+
+    def get_linesize(self):
+        return self.font.get_linesize()
+
+
+# every font is read and parsed once per size, building or rebuilding any part of the ui doesn't touch the disk
+fonts = {}
+caches = {}
+lock = threading.Lock()
+
+
+def load_font(path='data/font/font.ttf', size=15):
+    with lock:
+        font = fonts.get((path, size))
+        if font is None:
+            font = fonts[(path, size)] = pygame.font.Font(path, size)
+        return font
+
+
+def get(path='data/font/font.ttf', size=15):
+    # one text cache per font and size for the whole game, hud, menus and overlays all draw from the same ones
+    font = load_font(path, size)
+    with lock:
+        cache = caches.get((path, size))
+        if cache is None:
+            cache = caches[(path, size)] = TextCache(font)
+        return cache
@@ -1,6 +1,7 @@
 import pygame
 import time
-from . import player
+from . import player, fonts
+from .assets import load_image
 
 
 class Hud:
@@ -18,7 +19,7 @@ class Hud:
         self.last_time = time.time()
         self.dt = 1
 
-        self.font = pygame.font.Font('data/font/font.ttf', 10)
+        self.text_cache = fonts.get('data/font/font.ttf', 10)
 
         self.colors = {
             'black': (0, 0, 0),
@@ -27,50 +28,52 @@ class Hud:
         }
 
         self.heart_images = [
-            pygame.image.load('data/sprites/icons/heart.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/heart_half.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/heart_empty.png').convert_alpha()
+            load_image('data/sprites/icons/heart.png'),
+            load_image('data/sprites/icons/heart_half.png'),
+            load_image('data/sprites/icons/heart_empty.png')
         ]
 
         self.bullet_images = [
-            pygame.image.load('data/sprites/icons/bullet.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/bullet_empty.png').convert_alpha()
+            load_image('data/sprites/icons/bullet.png'),
+            load_image('data/sprites/icons/bullet_empty.png')
         ]
 
         self.weapon_images = [
-            pygame.image.load('data/sprites/icons/knife.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/pistol.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/rifle.png').convert_alpha()
+            load_image('data/sprites/icons/knife.png'),
+            load_image('data/sprites/icons/pistol.png'),
+            load_image('data/sprites/icons/rifle.png')
         ]
 
         self.reload_images = [
-            pygame.image.load('data/sprites/icons/reload_1.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/reload_2.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/reload_3.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/reload_4.png').convert_alpha(),
-            pygame.image.load('data/sprites/icons/reload_5.png').convert_alpha()
+            load_image('data/sprites/icons/reload_1.png'),
+            load_image('data/sprites/icons/reload_2.png'),
+            load_image('data/sprites/icons/reload_3.png'),
+            load_image('data/sprites/icons/reload_4.png'),
+            load_image('data/sprites/icons/reload_5.png')
         ]
 
-        self.border_20x20 = pygame.image.load('data/sprites/icons/border_20x20.png').convert_alpha()
-        self.border_36x20 = pygame.image.load('data/sprites/icons/border_36x20.png').convert_alpha()
+        self.border_20x20 = load_image('data/sprites/icons/border_20x20.png')
+        self.border_36x20 = load_image('data/sprites/icons/border_36x20.png')
 
-        self.heart_render = pygame.Surface((self.heart_images[0].get_width() * self.player.max_hearts, self.heart_images[0].get_height()))
-        self.heart_render.set_colorkey(self.colors['black'])
+        # every panel is drawn once for every state it can be in, an update just picks the right one
+        self.heart_renders = [self.bake_hearts(halves / 2) for halves in range(self.player.max_hearts * 2 + 1)]
 
-        self.bullets_render = pygame.Surface((self.bullet_images[0].get_width() * 10, (self.bullet_images[0].get_height() + 5) * int((self.player.rifle_max_ammo / 10))))
-        self.bullets_render.set_colorkey(self.colors['black'])
+        self.bullets_renders = {}
+        for max_ammo in (self.player.knife_max_ammo, self.player.pistol_max_ammo, self.player.rifle_max_ammo):
+            self.bullets_renders[max_ammo] = [self.bake_bullets(max_ammo, full) for full in range(max_ammo + 1)]
 
-        self.weapons_render = pygame.Surface((self.border_36x20.get_width(), (self.border_36x20.get_height() + 5) * len(self.weapon_images)))
-        self.weapons_render.set_colorkey(self.colors['black'])
+        self.weapons_renders = {weapon: self.bake_weapons(weapon) for weapon in ('knife', 'pistol', 'rifle')}
 
-        self.reload_render = pygame.Surface((self.reload_images[0].get_width(), self.reload_images[0].get_height()))
-        self.reload_render.set_colorkey(self.colors['black'])
+        self.reload_renders = [self.bake_reload(image) for image in self.reload_images]
 
         self.render_hearts()
         self.render_bullets()
         self.render_weapons()
         self.render_reload(self.last_reload)
 
+        # where the hud was drawn last time, for dirty rect rendering
+        self.rects = []
+
     def update(self):
         self.dt = time.time() - self.last_time
         self.dt *= 120
@@ -103,84 +106,204 @@ class Hud:
             self.render_reload(self.last_reload)
 
     def render(self, surface: pygame.Surface):
-        surface.blit(self.heart_render, (36, 36))
-
-        surface.blit(self.bullets_render, (1024 - self.bullets_render.get_width() - 36, 576 - self.bullets_render.get_height() - 36))
-
-        surface.blit(self.weapons_render, (1024 - self.weapons_render.get_width() - 36, 36))
+        self.rects = [
+            surface.blit(self.heart_render, (36, 36)),
+            surface.blit(self.bullets_render, (1024 - self.bullets_render.get_width() - 36, 576 - self.bullets_render.get_height() - 36)),
+            surface.blit(self.weapons_render, (1024 - self.weapons_render.get_width() - 36, 36))
+        ]
 
         if self.player.reloading or self.full_reload_count > 0:
-            surface.blit(self.reload_render, (1024 - self.reload_render.get_width() - 36, 576 - self.bullets_render.get_height() - 36 - 10 - self.reload_render.get_height()))
+            self.rects.append(surface.blit(self.reload_render, (1024 - self.reload_render.get_width() - 36, 576 - self.bullets_render.get_height() - 36 - 10 - self.reload_render.get_height())))
 
     def render_hearts(self):
-        self.heart_render.fill(self.colors['black'])
+        # half hearts are the smallest step, anything in between rounds down
+        halves = min(max(int(self.player.hearts * 2), 0), len(self.heart_renders) - 1)
+        self.heart_render = self.heart_renders[halves]
+
+    def render_bullets(self):
+        max_ammo, full = self.player.ammo
+        if max_ammo not in self.bullets_renders:
+            self.bullets_renders[max_ammo] = [self.bake_bullets(max_ammo, i) for i in range(max_ammo + 1)]
+
+        self.bullets_render = self.bullets_renders[max_ammo][min(max(full, 0), max_ammo)]
+
+    def render_weapons(self):
+        self.weapons_render = self.weapons_renders[self.player.active_weapon]
+
+    def render_reload(self, progress):
+        self.reload_render = self.reload_renders[min(int(progress * 4), 4)]
+
+    def bake_hearts(self, hearts):
+        heart_render = pygame.Surface((self.heart_images[0].get_width() * self.player.max_hearts, self.heart_images[0].get_height()))
+        heart_render.set_colorkey(self.colors['black'])
 
         x = 0
-        for i in range(int(self.player.hearts)):
-            self.heart_render.blit(self.heart_images[0], (i * self.heart_images[0].get_width(), 0))
+        for i in range(int(hearts)):
+            heart_render.blit(self.heart_images[0], (i * self.heart_images[0].get_width(), 0))
             x += 1
 
         next_x = x
-        if self.player.hearts % 1 == .5:
-            self.heart_render.blit(self.heart_images[1], (next_x * self.heart_images[1].get_width(), 0))
+        if hearts % 1 == .5:
+            heart_render.blit(self.heart_images[1], (next_x * self.heart_images[1].get_width(), 0))
             x += 1
 
         for i in range(self.player.max_hearts - x):
-            self.heart_render.blit(self.heart_images[2], ((i + x) * self.heart_images[2].get_width(), 0))
+            heart_render.blit(self.heart_images[2], ((i + x) * self.heart_images[2].get_width(), 0))
 
-    def render_bullets(self):
-        self.bullets_render = pygame.Surface((self.bullet_images[0].get_width() * 10, (self.bullet_images[0].get_height() + 5) * int((self.player.ammo[0] / 10))))
-        self.bullets_render.set_colorkey(self.colors['black'])
+        return heart_render
 
-        self.bullets_render.fill(self.colors['black'])
+    def bake_bullets(self, max_ammo, full):
+        bullets_render = pygame.Surface((self.bullet_images[0].get_width() * 10, (self.bullet_images[0].get_height() + 5) * int((max_ammo / 10))))
+        bullets_render.set_colorkey(self.colors['black'])
 
-        full = self.player.ammo[1]
-        empty = self.player.ammo[0] - full
+        empty = max_ammo - full
 
         x = 0
         y = 0
         for i in range(full):
-            self.bullets_render.blit(self.bullet_images[0], (x * self.bullet_images[0].get_width(), y * (self.bullet_images[0].get_height() + 5)))
+            bullets_render.blit(self.bullet_images[0], (x * self.bullet_images[0].get_width(), y * (self.bullet_images[0].get_height() + 5)))
             x += 1
             if x == 10:
                 x = 0
                 y += 1
 
         for i in range(empty):
-            self.bullets_render.blit(self.bullet_images[1], (x * self.bullet_images[0].get_width(), y * (self.bullet_images[0].get_height() + 5)))
+            bullets_render.blit(self.bullet_images[1], (x * self.bullet_images[0].get_width(), y * (self.bullet_images[0].get_height() + 5)))
             x += 1
             if x == 10:
                 x = 0
                 y += 1
 
-    def render_weapons(self):
-        self.weapons_render.fill(self.colors['black'])
+        return bullets_render
 
-        if self.player.active_weapon == 'rifle':
-            pygame.draw.rect(self.weapons_render, self.colors['selected_weapon'], (4, 4, 64, 32))
-        self.weapons_render.blit(self.border_36x20, (0, 0))
-        self.weapons_render.blit(self.weapon_images[2], (4, 4))
+    def bake_weapons(self, active_weapon):
+        weapons_render = pygame.Surface((self.border_36x20.get_width(), (self.border_36x20.get_height() + 5) * len(self.weapon_images)))
+        weapons_render.set_colorkey(self.colors['black'])
 
-        if self.player.active_weapon == 'pistol':
-            pygame.draw.rect(self.weapons_render, self.colors['selected_weapon'], (4 + 32, self.border_36x20.get_height() + 5 + 4, 32, 32))
-        self.weapons_render.blit(self.border_20x20, (32, self.border_36x20.get_height() + 5))
-        self.weapons_render.blit(self.weapon_images[1], (4 + 32, self.border_36x20.get_height() + 5 + 4))
+        if active_weapon == 'rifle':
+            pygame.draw.rect(weapons_render, self.colors['selected_weapon'], (4, 4, 64, 32))
+        weapons_render.blit(self.border_36x20, (0, 0))
+        weapons_render.blit(self.weapon_images[2], (4, 4))
 
-        if self.player.active_weapon == 'knife':
-            pygame.draw.rect(self.weapons_render, self.colors['selected_weapon'], (4 + 32, self.border_36x20.get_height() * 2 + 5 * 2 + 4, 32, 32))
-        self.weapons_render.blit(self.border_20x20, (32, self.border_36x20.get_height() * 2 + 5 * 2))
-        self.weapons_render.blit(self.weapon_images[0], (4 + 32, self.border_36x20.get_height() * 2 + 5 * 2 + 4))
+        if active_weapon == 'pistol':
+            pygame.draw.rect(weapons_render, self.colors['selected_weapon'], (4 + 32, self.border_36x20.get_height() + 5 + 4, 32, 32))
+        weapons_render.blit(self.border_20x20, (32, self.border_36x20.get_height() + 5))
+        weapons_render.blit(self.weapon_images[1], (4 + 32, self.border_36x20.get_height() + 5 + 4))
 
-    def render_reload(self, progress):
-        self.reload_render.fill(self.colors['black'])
-
-        if progress < .25:
-            self.reload_render.blit(self.reload_images[0], (0, 0))
-        elif progress < .5:
-            self.reload_render.blit(self.reload_images[1], (0, 0))
-        elif progress < .75:
-            self.reload_render.blit(self.reload_images[2], (0, 0))
-        elif progress < 1:
-            self.reload_render.blit(self.reload_images[3], (0, 0))
-        else:
-            self.reload_render.blit(self.reload_images[4], (0, 0))
+        if active_weapon == 'knife':
+            pygame.draw.rect(weapons_render, self.colors['selected_weapon'], (4 + 32, self.border_36x20.get_height() * 2 + 5 * 2 + 4, 32, 32))
+        weapons_render.blit(self.border_20x20, (32, self.border_36x20.get_height() * 2 + 5 * 2))
+        weapons_render.blit(self.weapon_images[0], (4 + 32, self.border_36x20.get_height() * 2 + 5 * 2 + 4))
+
+        return weapons_render
+
+    def bake_reload(self, image):
+        reload_render = pygame.Surface((self.reload_images[0].get_width(), self.reload_images[0].get_height()))
+        reload_render.set_colorkey(self.colors['black'])
+        reload_render.blit(image, (0, 0))
+
+        return reload_render
+
+
+class NetworkOverlay:
+    def __init__(self, refresh_interval=.5):
+        # the numbers are only redrawn every refresh interval, rendering text every frame costs more than it shows
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0
+
+        self.text_cache = fonts.get('data/font/font.ttf', 10)
+
+        self.colors = {
+            'background': (48, 44, 46),
+            'text': (223, 246, 245)
+        }
+
+        self.overlay_render = None
+
+    def update(self, stats: dict):
+        if time.time() - self.last_refresh < self.refresh_interval:
+            return
+        self.last_refresh = time.time()
+
+        lines = []
+        for name, s in stats.items():
+            rtt = f'{s["rtt"] * 1000:.1f} ms' if s['rtt'] is not None else '-'
+            rates = s['per_second']
+            line = f'{name}  rtt {rtt}  in {rates["bytes_in"] / 1024:.1f} kB/s {rates["messages_in"]:.0f}/s  out {rates["bytes_out"] / 1024:.1f} kB/s {rates["messages_out"]:.0f}/s  decode errors {s["decode_errors"]}'
+            if 'queue_depth' in s:
+                line += f'  queue {s["queue_depth"]}  coalesced {s["coalesced"]}'
+            lines.append(line)
+
+            for direction, kinds in s['histograms'].items():
+                for kind, buckets in kinds.items():
+                    lines.append(f'    {direction} {kind}  ' + '  '.join(f'<={size}b: {count}' for size, count in buckets.items()))
+
+        if not lines:
+            lines.append('no connections')
+
+        line_height = self.text_cache.get_linesize()
+        width = max(self.text_cache.size(line)[0] for line in lines) + 10
+        self.overlay_render = pygame.Surface((width, line_height * len(lines) + 10))
+        self.overlay_render.fill(self.colors['background'])
+        self.overlay_render.set_alpha(200)
+
+        for i, line in enumerate(lines):
+            self.text_cache.blit(self.overlay_render, line, (5, 5 + i * line_height), self.colors['text'])
+
+    def render(self, surface: pygame.Surface):
+        if self.overlay_render:
+            return surface.blit(self.overlay_render, (5, 576 - self.overlay_render.get_height() - 5))
+
+
+class ProfilerOverlay:
+    def __init__(self, refresh_interval=.25, graph_frames=150, graph_height=60, budget=1 / 120):
+        # like the network overlay, redrawing it every frame would show up in the very numbers it shows
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0
+
+        self.graph_frames = graph_frames
+        self.graph_height = graph_height
+
+        # the frame time the game aims for, drawn as a line through the graph
+        self.budget = budget
+
+        self.text_cache = fonts.get('data/font/font.ttf', 10)
+
+        self.colors = {
+            'background': (48, 44, 46),
+            'text': (223, 246, 245),
+            'frame': (125, 112, 113),
+            'slow_frame': (200, 80, 80),
+            'budget': (223, 246, 245)
+        }
+
+        self.overlay_render = None
+
+    def update(self, profiler):
+        if time.time() - self.last_refresh < self.refresh_interval:
+            return
+        self.last_refresh = time.time()
+
+        frame_time, phases = profiler.averages()
+        lines = [f'frame {frame_time:.2f} ms']
+        lines += [f'{name}  {ms:.2f} ms' for name, ms in list(phases.items())[:12]]
+
+        line_height = self.text_cache.get_linesize()
+        width = max(self.graph_frames, max(self.text_cache.size(line)[0] for line in lines)) + 10
+        self.overlay_render = pygame.Surface((width, self.graph_height + line_height * len(lines) + 15))
+        self.overlay_render.fill(self.colors['background'])
+        self.overlay_render.set_alpha(200)
+
+        # one column per frame, twice the budget fills the graph
+        scale = self.graph_height / (self.budget * 2)
+        frames = list(profiler.frames)[-self.graph_frames:]
+        for x, (start, end, _) in enumerate(frames):
+            height = min((end - start) * scale, self.graph_height)
+            color = self.colors['slow_frame'] if end - start > self.budget else self.colors['frame']
+            pygame.draw.line(self.overlay_render, color, (5 + x, 5 + self.graph_height), (5 + x, 5 + self.graph_height - height))
+
+        budget_y = 5 + self.graph_height - self.budget * scale
+        pygame.draw.line(self.overlay_render, self.colors['budget'], (5, budget_y), (5 + self.graph_frames, budget_y))
+
+        for i, line in enumerate(lines):
+            self.text_cache.blit(self.overlay_render, line, (5, self.graph_height + 10 + i * line_height), self.colors['text'])
@@ -0,0 +1,70 @@
+import math
+
+
+class InterestManager:
+    def __init__(self, map, margin=48, bullet_step=64, bullet_range=1200):
+        self.map = map
+
+        # players count as visible a bit before they step out of cover, so nothing pops in
+        self.margin = margin
+
+        self.bullet_step = bullet_step
+        self.bullet_range = bullet_range
+
+    def line_of_sight(self, start, end):
+        for wall in self.map.inside_walls:
+            if wall.rect.clipline(start, end):
+                return False
+        return True
+
+    def player_visible(self, viewer, target):
+        x, y = target
+        samples = [
+            (x, y),
+            (x - self.margin, y),
+            (x + self.margin, y),
+            (x, y - self.margin),
+            (x, y + self.margin)
+        ]
+
+        for sample in samples:
+            if self.line_of_sight(viewer, sample):
+                return True
+        return False
+
+    def bullet_visible(self, viewer, direction, center):
+        length = self.bullet_path_length(direction, center)
+
+        distance = 0
+        while distance <= length:
+            sample = (center[0] + direction[0] * distance, center[1] + direction[1] * distance)
+            if self.line_of_sight(viewer, sample):
+                return True
+            distance += self.bullet_step
+
+        return False
+
+    def bullet_path_length(self, direction, center):
+        end = (center[0] + direction[0] * self.bullet_range, center[1] + direction[1] * self.bullet_range)
+
+        length = self.bullet_range
+        for wall in self.map.walls:
+            clipped = wall.rect.clipline(center, end)
+            if clipped:
+                hit = clipped[0]
+                length = min(length, math.dist(center, hit))
+
+        return length
+
+    def filter_players(self, viewer, players, own_id=None):
+        filtered = []
+        for p in players:
+            player_id, center, rotation, weapon, frame, bullets, team, hearts = p
+            bullets = [b for b in bullets if player_id == own_id or self.bullet_visible(viewer, b[1], b[2])]
+
+            if player_id == own_id or self.player_visible(viewer, center):
+                filtered.append([player_id, center, rotation, weapon, frame, bullets, team, hearts])
+            else:
+                filtered.append([player_id, None, None, None, None, bullets, team, hearts])
+
+        return filtered
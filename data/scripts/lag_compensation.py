@@ -0,0 +1,78 @@
+import time
+from collections import deque
+
+
+class LagCompensator:
+    def __init__(self, history_size=64, interpolation_delay=.1, max_rewind=.5):
+        # recent (time, center, mask, rect size) samples per player id, the oldest fall out on their own
+        self.history = {}
+        self.history_size = history_size
+
+        # clients draw everybody else this far in the past, see RemotePlayer.interpolation_delay
+        self.interpolation_delay = interpolation_delay
+
+        # never rewind further than this, no matter how bad a connection is
+        self.max_rewind = max_rewind
+
+    def record(self, player_id, p, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        samples = self.history.get(player_id)
+        if samples is None:
+            samples = self.history[player_id] = deque(maxlen=self.history_size)
+
+        samples.append((timestamp, p.center, p.mask, p.rect.size))
+
+    def forget(self, player_id):
+        self.history.pop(player_id, None)
+
+    def rewind_time(self, rtt, now=None):
+        if now is None:
+            now = time.time()
+
+        # a bullet the host simulates now left the shooter half a round trip ago,
+        # while the shooter was looking at snapshots that were half a round trip plus the interpolation delay old
+        if rtt is None:
+            return now
+
+        return now - min(rtt + self.interpolation_delay, self.max_rewind)
+
+    def sample_at(self, player_id, timestamp):
+        samples = self.history.get(player_id)
+        if not samples:
+            return None
+
+        if timestamp <= samples[0][0]:
+            return samples[0][1:]
+
+        if timestamp >= samples[-1][0]:
+            return samples[-1][1:]
+
+        # samples are in order, walk back from the newest one since rewinds are short
+        for i in range(len(samples) - 1, 0, -1):
+            older, newer = samples[i - 1], samples[i]
+            if older[0] <= timestamp:
+                t = (timestamp - older[0]) / (newer[0] - older[0]) if newer[0] > older[0] else 1
+                center = (
+                    older[1][0] + (newer[1][0] - older[1][0]) * t,
+                    older[1][1] + (newer[1][1] - older[1][1]) * t
+                )
+                # masks can't be blended, use the one of the closer sample
+                _, _, mask, size = newer if t >= .5 else older
+                return center, mask, size
+
+        return samples[0][1:]
+
+    def hit(self, player_id, position, bullet_mask, timestamp):
+        # position is the top left corner of the bullet
+        sample = self.sample_at(player_id, timestamp)
+        if sample is None:
+            return False
+
+        center, mask, size = sample
+        offset = (
+            round(position[0] - (center[0] - size[0] / 2)),
+            round(position[1] - (center[1] - size[1] / 2))
+        )
+        return mask.overlap(bullet_mask, offset) is not None
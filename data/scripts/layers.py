@@ -0,0 +1,45 @@
+import pygame
+
+
+class StaticLayer:
+    def __init__(self, map, shadow_caster, background_color, size):
+        self.map = map
+        self.shadow_caster = shadow_caster
+        self.background_color = background_color
+
+        # background, shadows and map in one opaque surface, a frame starts with a single blit of it
+        self.render_surface = pygame.Surface(size)
+
+        # just shadows and map, to put back on top of whatever has to be hidden behind them.
+        # per pixel alpha, so the soft edges of smoothed shadows cover just as much as they shade
+        self.cover_surface = pygame.Surface(size, pygame.SRCALPHA)
+
+        # without a window (tests, tools) there is no pixel format to convert to
+        if pygame.display.get_surface() is not None:
+            self.render_surface = self.render_surface.convert()
+            self.cover_surface = self.cover_surface.convert_alpha()
+
+        self.version = None
+
+    def update(self):
+        # the map never changes, so the layer is only out of date once the shadows are
+        if self.shadow_caster.version == self.version:
+            return
+
+        self.version = self.shadow_caster.version
+
+        self.render_surface.fill(self.background_color)
+        self.shadow_caster.render(self.render_surface)
+        self.map.draw(self.render_surface)
+
+        self.cover_surface.fill((0, 0, 0, 0))
+        self.shadow_caster.render(self.cover_surface)
+        self.map.draw(self.cover_surface)
+
+    def render(self, surface):
+        surface.blit(self.render_surface, (0, 0))
+
+    def cover(self, surface, rects):
+        # other players and their bullets sit below the shadows, draw the layer over just the spots they touched
+        for rect in rects:
+            surface.blit(self.cover_surface, rect, rect)
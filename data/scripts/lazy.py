@@ -0,0 +1,57 @@
+import importlib, threading, time
+from .logger import log, INFO
+
+# every module handed out by module(), by name
+modules = {}
+
+# seconds every lazy module took to import and the thread it happened on, for the import report
+import_times = {}
+
+
+class LazyModule:
+    # stands in for a module until something uses one of its attributes, then imports it once
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self._name)
+                import_times[self._name] = (time.perf_counter() - start, threading.current_thread().name)
+                log(f'imported {self._name} in {import_times[self._name][0] * 1000:.0f} ms on {import_times[self._name][1]}', INFO)
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._module or self._load(), attribute)
+
+
+def module(name):
+    if name not in modules:
+        modules[name] = LazyModule(name)
+    return modules[name]
+
+
+def preload():
+    # imports every lazy module on a background thread, the menu stays responsive while scipy and shapely load
+    def load_all():
+        for m in list(modules.values()):
+            m._load()
+
+        for line in report():
+            log(f'import report: {line}', INFO)
+
+    thread = threading.Thread(target=load_all, name='preload', daemon=True)
+    thread.start()
+    return thread
+
+
+def report():
+    lines = [f'{name}: {seconds * 1000:.0f} ms on {thread}' for name, (seconds, thread) in sorted(import_times.items(), key=lambda item: -item[1][0])]
+    pending = [name for name, m in modules.items() if m._module is None]
+    if pending:
+        lines.append('not imported yet: ' + ', '.join(pending))
+    return lines
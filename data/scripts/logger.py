@@ -0,0 +1,150 @@
+import logging, logging.handlers, queue, struct, time, atexit
+
+# binary logs: magic, then per record its time, level and message length followed by the utf8 message
+BINARY_MAGIC = b'CSLL\x01'
+BINARY_RECORD = struct.Struct('<dBI')
+
+listener = None
+queue_handler = None
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # the game and network threads only hand records over, a full queue drops them instead of waiting for the disk
+    def __init__(self, log_queue):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # just fix the message while its arguments still look the same, formatting happens on the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # stopping has to wait for room in a full queue, everything before the sentinel still gets written
+        self.queue.put(self._sentinel)
+
+
+class RateLimitFilter(logging.Filter):
+    # at most rate records per second from every line that logs, with bursts of up to burst records.
+    # what's left out is counted and mentioned with the next record that gets through
+    def __init__(self, rate=20, burst=50):
+        logging.Filter.__init__(self)
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+
+        tokens, last, dropped = self.buckets.get(key, (self.burst, now, 0))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+        if tokens < 1:
+            self.buckets[key] = (tokens, now, dropped + 1)
+            return False
+
+        if dropped:
+            record.msg = f'{record.msg} ({dropped} more like this were dropped)'
+        self.buckets[key] = (tokens - 1, now, 0)
+        return True
+
+
+class BinaryFileHandler(logging.FileHandler):
+    def __init__(self, filename):
+        logging.FileHandler.__init__(self, filename, mode='wb')
+        self.stream.write(BINARY_MAGIC)
+
+    def _open(self):
+        return open(self.baseFilename, self.mode)
+
+    def emit(self, record):
+        try:
+            message = record.getMessage().encode('utf8')
+            self.stream.write(BINARY_RECORD.pack(record.created, record.levelno, len(message)) + message)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def read_binary(path):
+    # yields (time, level name, message) of every record in a binary log
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError(f'{path} is not a binary log')
+
+    offset = len(BINARY_MAGIC)
+    while offset + BINARY_RECORD.size <= len(data):
+        created, level, length = BINARY_RECORD.unpack_from(data, offset)
+        offset += BINARY_RECORD.size
+        if offset + length > len(data):
+            break
+
+        yield created, logging.getLevelName(level), data[offset:offset + length].decode('utf8', 'replace')
+        offset += length
+
+
+def setup(filename='data/logs/session.log', level=logging.DEBUG, rate_limit=None, binary=False, max_queue_size=10000):
+    global listener, queue_handler
+    stop()
+
+    if binary:
+        handler = BinaryFileHandler(filename)
+    else:
+        handler = logging.FileHandler(filename, mode='w')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s', '%d.%m.%y %H:%M:%S'))
+
+    # the file is written on the listener's thread, never on the one that logs
+    queue_handler = NonBlockingQueueHandler(queue.Queue(max_queue_size))
+    if rate_limit:
+        queue_handler.addFilter(RateLimitFilter(rate_limit))
+
+    root = logging.getLogger()
+    for h in root.handlers[:]:
+        root.removeHandler(h)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = Listener(queue_handler.queue, handler)
+    listener.start()
+
+
+def set_level(level):
+    logging.getLogger().setLevel(level)
+
+
+def stop():
+    # writes out what's still queued, runs on exit on its own but spawned processes have to call it themselves
+    global listener
+    if listener is None:
+        return
+
+    if queue_handler.dropped:
+        queue_handler.queue.put(logging.makeLogRecord({'msg': f'dropped {queue_handler.dropped} log records, the log queue was full', 'levelno': logging.WARNING, 'levelname': 'WARNING'}))
+
+    listener.stop()
+    for h in listener.handlers:
+        h.close()
+    listener = None
+
+
+atexit.register(stop)
+
+
+# levels for log(), connections, failures and summaries still show up with a higher log level
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+
+
+def log(message, level=DEBUG):
+    logging.log(level, f'{message}', stacklevel=2)
@@ -1,6 +1,9 @@
 import pygame
 import csv
-from shapely import geometry
+from . import lazy
+from .assets import load_image
+
+geometry = lazy.module('shapely.geometry')
 
 
 class Tile:
@@ -69,7 +72,7 @@ class Map:
         for i, line in enumerate(self.map):
             for j, tile in enumerate(line):
                 if tile != '-1':
-                    image = pygame.image.load(f'data/sprites/tiles/tile_{tile}.png').convert_alpha()
+                    image = load_image(f'data/sprites/tiles/tile_{tile}.png')
                     surface.blit(image, (j * 32, i * 32))
 
                     tile_object = Tile(image, pygame.Rect(j * 32, i * 32, 32, 32))
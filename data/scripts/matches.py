@@ -0,0 +1,201 @@
+import threading, json, multiprocessing
+from multiprocessing import reduction
+from multiprocessing.connection import wait
+from . import server, connection, logger
+from .logger import log, INFO, WARNING, ERROR
+from socket import AF_INET, socket, SOCK_STREAM, SOCK_DGRAM, SHUT_RDWR, timeout
+
+
+class MatchWorker(server.DedicatedServer):
+    def __init__(self, name, path, teams, tick_rate, client_pipe, status_pipe, compression='zlib'):
+        # clients come in through this pipe, status updates go back through the other one
+        self.client_pipe = client_pipe
+        self.status_pipe = status_pipe
+
+        server.DedicatedServer.__init__(self, None, path, name, teams, tick_rate, compression)
+
+        self.receive_thread = threading.Thread(target=self.receive_clients, daemon=True)
+        self.receive_thread.start()
+
+    def update_status(self):
+        server.DedicatedServer.update_status(self)
+        self.status_pipe.send_bytes(self.status)
+
+    def receive_clients(self):
+        while True:
+            try:
+                message = self.client_pipe.recv()
+            except EOFError:
+                message = None
+
+            if message is None:
+                self.running = False
+                return
+
+            hello, address = message
+            client = socket(fileno=reduction.recv_handle(self.client_pipe))
+            log(f'{address[0]}:{address[1]} has connected', INFO)
+
+            self.addresses[client] = tuple(address)
+            threading.Thread(target=self.handle_client, args=(client, hello)).start()
+
+
+def run_match(name, path, teams, tick_rate, client_pipe, status_pipe, compression):
+    logger.setup(f'data/logs/match_{name}.log')
+
+    worker = MatchWorker(name, path, teams, tick_rate, client_pipe, status_pipe, compression)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    worker.stop()
+    logger.stop()
+
+
+class MatchHost:
+    def __init__(self, port: int, matches: dict, tick_rate=60, compression='zlib'):
+        # matches is {name: (map path, teams)}, clients that don't name a match go to the first one
+        self.port = port
+        self.address = ('', port)
+        self.buffer_size = 1024
+        self.hello_timeout = .5
+        self.default_match = next(iter(matches))
+
+        # spawned workers start clean and only inherit their own pipe ends, so they notice when the host dies
+        context = multiprocessing.get_context('spawn')
+
+        self.processes = {}
+        self.client_pipes = {}
+        self.status_pipes = {}
+        self.statuses = {}
+
+        for name, (path, teams) in matches.items():
+            client_pipe, worker_client_pipe = context.Pipe()
+            worker_status_pipe, status_pipe = context.Pipe()
+
+            process = context.Process(target=run_match, args=(name, path, teams, tick_rate, worker_client_pipe, worker_status_pipe, compression), name=f'match {name}', daemon=True)
+            process.start()
+
+            self.processes[name] = process
+            self.client_pipes[name] = client_pipe
+            self.status_pipes[status_pipe] = name
+            self.statuses[name] = {'name': name, 'teams': teams, 'names': [], 'map': path, 'players': 0}
+
+        # answers to status queries by match, rebuilt whenever a worker reports a change
+        self.responses = {}
+        self.update_responses()
+
+        # clients are routed on their own threads, a client and its socket handle must not interleave with another one
+        self.pipe_lock = threading.Lock()
+
+        self.server = socket(AF_INET, SOCK_STREAM)
+        self.server.bind(self.address)
+        self.server.listen()
+
+        self.status_socket = socket(AF_INET, SOCK_DGRAM)
+        self.status_socket.bind(self.address)
+        self.status_socket.settimeout(.5)
+
+        self.running = True
+
+        self.status_thread = threading.Thread(target=self.collect_statuses, daemon=True)
+        self.status_thread.start()
+
+        self.query_thread = threading.Thread(target=self.answer_status_queries, daemon=True)
+        self.query_thread.start()
+
+    def run(self):
+        while self.running:
+            try:
+                client, client_address = self.server.accept()
+            except OSError:
+                break
+
+            threading.Thread(target=self.route_client, args=(client, client_address), daemon=True).start()
+
+    def route_client(self, client, client_address):
+        try:
+            hello = connection.receive_hello(client, self.hello_timeout, self.buffer_size)
+        except OSError:
+            log(f'{client_address[0]}:{client_address[1]} lost connection during the handshake', WARNING)
+            client.close()
+            return
+
+        name = hello.get('match') or self.default_match
+        if name not in self.processes or not self.processes[name].is_alive():
+            log(f'{client_address[0]}:{client_address[1]} asked for the unknown match {name}', WARNING)
+            client.close()
+            return
+
+        with self.pipe_lock:
+            try:
+                self.client_pipes[name].send((hello, client_address))
+                reduction.send_handle(self.client_pipes[name], client.fileno(), self.processes[name].pid)
+            except OSError as e:
+                log(f'could not hand {client_address[0]}:{client_address[1]} over to match {name}', ERROR)
+                log(e, ERROR)
+
+        # the worker has its own copy of the socket now
+        client.close()
+
+    def collect_statuses(self):
+        while self.running and self.status_pipes:
+            for status_pipe in wait(list(self.status_pipes), .5):
+                name = self.status_pipes[status_pipe]
+                try:
+                    self.statuses[name] = json.loads(status_pipe.recv_bytes())
+                except (EOFError, OSError):
+                    log(f'match {name} stopped', INFO)
+                    del self.status_pipes[status_pipe]
+                    continue
+
+                self.update_responses()
+
+    def update_responses(self):
+        # every answer lists all matches with their player count, so a browser needs just one query
+        matches = {name: status['players'] for name, status in self.statuses.items()}
+        self.responses = {name: bytes(json.dumps({**status, 'match': name, 'matches': matches}), 'utf8') for name, status in self.statuses.items()}
+
+    def answer_status_queries(self):
+        while True:
+            try:
+                data, address = self.status_socket.recvfrom(self.buffer_size)
+            except timeout:
+                continue
+            except OSError:
+                break
+
+            query, _, name = data.partition(b' ')
+            if query != server.STATUS_QUERY:
+                continue
+
+            response = self.responses.get(name.decode('utf8', 'replace') or self.default_match)
+            if response is None:
+                continue
+
+            try:
+                self.status_socket.sendto(response, address)
+            except OSError as e:
+                log(f'could not answer the status query of {address[0]}:{address[1]}', WARNING)
+                log(e, WARNING)
+
+    def stop(self):
+        self.running = False
+
+        for client_pipe in self.client_pipes.values():
+            try:
+                client_pipe.send(None)
+            except OSError:
+                pass
+
+        for process in self.processes.values():
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+        self.status_socket.close()
+        try:
+            self.server.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
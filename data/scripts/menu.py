@@ -1,4 +1,5 @@
 import pygame
+from . import fonts
 
 
 class Button:
@@ -13,7 +14,7 @@ class Button:
             'text': (223, 246, 245)
         }
 
-        self.font = pygame.font.Font('data/font/font.ttf', 20)
+        self.text_cache = fonts.get('data/font/font.ttf', 20)
 
         if not self.image:
             self.image = pygame.Surface((self.rect.width, self.rect.height))
@@ -21,7 +22,7 @@ class Button:
 
             self.image.fill(self.color)
 
-            self.image.blit(self.font.render(self.title, True, self.colors['text']), (0, 0))
+            self.image.blit(self.text_cache.render(self.title, self.colors['text']), (0, 0))
 
         self.pressed = False
 
@@ -57,7 +58,7 @@ class Input:
             'text': (48, 44, 46)
         }
 
-        self.font = pygame.font.Font('data/font/font.ttf', 20)
+        self.text_cache = fonts.get('data/font/font.ttf', 20)
 
         self.render_surface = pygame.Surface((self.rect.width, self.rect.height))
         self.render_surface.set_colorkey(self.colors['black'])
@@ -89,20 +90,27 @@ class Input:
             if got_input:
                 self.pre_render()
 
+            return got_input
+
+        return False
+
     def render(self, surface):
         surface.blit(self.render_surface, self.rect)
 
     def pre_render(self):
+        # the menu draws inputs again only after they changed
+        self.dirty = True
+
         image_x = self.rect.width / 2 - self.image.get_width() / 2
         image_y = self.rect.height / 2 - self.image.get_height() / 2
         self.render_surface.blit(self.image, (image_x, image_y))
 
         if self.text != '':
-            text_render = self.font.render(self.text, True, self.colors['text'])
+            text_render = self.text_cache.render(self.text, self.colors['text'])
             text_x = 10
             text_y = self.rect.height / 2 - text_render.get_height() / 2
         else:
-            text_render = self.font.render(self.title, True, self.colors['text_preset'])
+            text_render = self.text_cache.render(self.title, self.colors['text_preset'])
             text_x = 10
             text_y = self.rect.height / 2 - text_render.get_height() / 2
 
@@ -124,9 +132,9 @@ class Text:
             'text': color
         }
 
-        self.font = pygame.font.Font('data/font/font.ttf', 20)
+        self.text_cache = fonts.get('data/font/font.ttf', 20)
 
-        self.text_render = self.font.render(self.text, True, self.colors['text'], self.colors['background'])
+        self.text_render = self.text_cache.render(self.text, self.colors['text'], self.colors['background'])
         self.rect = self.text_render.get_rect()
 
         self.render_surface = pygame.Surface((self.rect.width, self.rect.height))
@@ -155,9 +163,9 @@ class Menu:
         }
 
         self.content_space = 15
-        self.font = pygame.font.Font('data/font/font.ttf', 20)
-        self.title_font = pygame.font.Font('data/font/font.ttf', 30)
-        self.title_render = self.title_font.render(self.title, True, self.colors['text'], self.colors['background'])
+        self.text_cache = fonts.get('data/font/font.ttf', 20)
+        self.title_cache = fonts.get('data/font/font.ttf', 30)
+        self.title_render = self.title_cache.render(self.title, self.colors['text'], self.colors['background'])
 
         self.width = self.title_render.get_width()
         self.height = self.title_render.get_height() + self.content_space
@@ -176,11 +184,29 @@ class Menu:
 
         self.render_surface = None
         self.rect = None
+
+        # set whenever the menu looks different, scenes only redraw it then
+        self.dirty = True
+
+        # buttons and inputs by title for get_pressed and get_text, the first of each kind wins like in the content list
+        self.buttons = {}
+        self.inputs_by_title = {}
+        self.inputs = []
+        self.index_content()
+
+        # buttons stay pressed for the one frame they were clicked in
+        self.pressed = []
+
         self.pre_render()
 
     def update(self, input):
-        mouse_pos = pygame.mouse.get_pos()
-        pos_on_menu = (mouse_pos[0] - self.x, mouse_pos[1] - self.y)
+        for c in self.pressed:
+            c.update()
+        self.pressed = []
+
+        # nothing happened, nothing to do
+        if not input:
+            return
 
         clicked = False
         for event in input:
@@ -189,34 +215,44 @@ class Menu:
                     clicked = True
 
         if clicked:
+            mouse_pos = pygame.mouse.get_pos()
+            pos_on_menu = (mouse_pos[0] - self.x, mouse_pos[1] - self.y)
+
             for c in self.content:
-                c.update(pos_on_menu)
-                c.render(self.render_surface)
+                if c.update(pos_on_menu):
+                    self.pressed.append(c)
         else:
-            for c in self.content:
-                if isinstance(c, Button):
-                    c.update()
-                    c.render(self.render_surface)
-                elif isinstance(c, Input):
-                    c.handle_input(input)
-                    c.render(self.render_surface)
+            for c in self.inputs:
+                c.handle_input(input)
+
+        for c in self.inputs:
+            if c.dirty:
+                c.render(self.render_surface)
+                c.dirty = False
+                self.dirty = True
 
     def render(self, surface):
         surface.blit(self.render_surface, self.position)
 
     def get_pressed(self, title):
-        for c in self.content:
-            if isinstance(c, Button):
-                if c.title == title:
-                    return c.get_pressed()
-        return False
+        c = self.buttons.get(title)
+        return c.get_pressed() if c else False
 
     def get_text(self, title):
-        for c in self.content:
-            if isinstance(c, Input):
-                if c.title == title:
-                    return c.get_text()
-        return ''
+        c = self.inputs_by_title.get(title)
+        return c.get_text() if c else ''
+
+    def index_content(self):
+        self.inputs = [c for c in self.content if isinstance(c, Input)]
+
+        self.buttons = {}
+        for c in reversed(self.content):
+            if isinstance(c, Button):
+                self.buttons[c.title] = c
+
+        self.inputs_by_title = {}
+        for c in reversed(self.inputs):
+            self.inputs_by_title[c.title] = c
 
     def pre_render(self):
         for c in self.content:
@@ -233,6 +269,7 @@ class Menu:
 
         self.rect = self.render_surface.get_rect()
         self.rect.topleft = self.position
+        self.dirty = True
 
         title_x = self.width / 2 - self.title_render.get_width() / 2
         title_y = 0
@@ -242,6 +279,8 @@ class Menu:
             c.rect.x = self.width / 2 - c.rect.width / 2
 
             c.render(self.render_surface)
+            if isinstance(c, Input):
+                c.dirty = False
 
         if self.alignment:
             if self.alignment == 'center':
@@ -250,20 +289,66 @@ class Menu:
 
     def add_content(self, content, index=-1):
         if index == -1:
-            self.content.append(content)
-        else:
-            self.content.insert(index, content)
+            index = len(self.content)
+        self.content.insert(index, content)
+        self.index_content()
 
-        self.width = self.title_render.get_width()
-        self.height = self.title_render.get_height() + self.content_space
-        self.pre_render()
+        if content.rect.width > self.width:
+            self.layout()
+            return
+
+        # everything below moves down to make room, the rest of the menu stays as it is
+        y = self.content[index + 1].rect.y if index + 1 < len(self.content) else self.height
+        space = content.rect.height + self.content_space
+        for c in self.content[index + 1:]:
+            c.rect.y += space
+
+        self.resize(y, space)
+
+        content.rect.topleft = (self.width / 2 - content.rect.width / 2, y)
+        content.render(self.render_surface)
+        if isinstance(content, Input):
+            content.dirty = False
 
     def remove_content(self, title):
-        for c in self.content:
-            if c.title == title:
-                self.content.remove(c)
+        for index, content in enumerate(self.content):
+            if content.title == title:
                 break
+        else:
+            return
+
+        del self.content[index]
+        self.index_content()
+
+        # without its widest part the menu gets narrower, everything has to be centered again
+        if max([self.title_render.get_width()] + [c.rect.width for c in self.content]) < self.width:
+            self.layout()
+            return
+
+        space = content.rect.height + self.content_space
+        for c in self.content[index:]:
+            c.rect.y -= space
+
+        self.resize(content.rect.y, -space)
+
+    def resize(self, y, space):
+        # a new surface, taller or shorter by space at y, with the old contents above and below y
+        render_surface = pygame.Surface((self.width, self.height + space))
+        render_surface.set_colorkey(self.colors['black'])
+
+        render_surface.blit(self.render_surface, (0, 0), (0, 0, self.width, y))
+        if space > 0:
+            render_surface.blit(self.render_surface, (0, y + space), (0, y, self.width, self.height - y))
+        else:
+            render_surface.blit(self.render_surface, (0, y), (0, y - space, self.width, self.height - y + space))
+
+        self.height += space
+        self.render_surface = render_surface
+        self.rect = self.render_surface.get_rect()
+        self.rect.topleft = self.position
+        self.dirty = True
 
+    def layout(self):
         self.width = self.title_render.get_width()
         self.height = self.title_render.get_height() + self.content_space
         self.pre_render()
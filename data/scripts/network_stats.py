@@ -0,0 +1,106 @@
+import threading, time
+from collections import deque
+
+
+def message_kind(message: bytes):
+    # every message is a json object, its first key tells what it is: {"players": ..., {"damage": ...
+    if message[:2] == b'{"':
+        end = message.find(b'"', 2)
+        if end != -1:
+            return message[2:end].decode('utf8', 'replace')
+    return message[:8].decode('utf8', 'replace') or 'empty'
+
+
+def size_bucket(size):
+    # powers of two, so the histogram has a handful of buckets no matter how big the messages get
+    return 1 << max(size - 1, 0).bit_length()
+
+
+class NetworkStats:
+    def __init__(self, rate_window=2):
+        self.lock = threading.Lock()
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.decode_errors = 0
+
+        # message sizes by direction, message kind and size bucket
+        self.histograms = {'in': {}, 'out': {}}
+
+        self.rtt = None
+        self.last_rtt = None
+
+        # (time, bytes in, bytes out, messages in, messages out) to turn the totals into rates
+        self.rate_window = rate_window
+        self.samples = deque()
+
+    def received(self, message: bytes, wire_size=None):
+        self.count('in', message, wire_size)
+
+    def sent(self, message: bytes, wire_size=None):
+        self.count('out', message, wire_size)
+
+    def count(self, direction, message, wire_size=None):
+        size = len(message) if wire_size is None else wire_size
+        kind = message_kind(message)
+        bucket = size_bucket(size)
+
+        with self.lock:
+            if direction == 'in':
+                self.bytes_in += size
+                self.messages_in += 1
+            else:
+                self.bytes_out += size
+                self.messages_out += 1
+
+            histogram = self.histograms[direction].setdefault(kind, {})
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def decode_error(self):
+        with self.lock:
+            self.decode_errors += 1
+
+    def add_rtt(self, rtt):
+        with self.lock:
+            self.last_rtt = rtt
+            # smooth it out, a single slow pong shouldn't make the numbers jump around
+            self.rtt = rtt if self.rtt is None else self.rtt * .8 + rtt * .2
+
+    def rates(self):
+        now = time.time()
+        with self.lock:
+            totals = (self.bytes_in, self.bytes_out, self.messages_in, self.messages_out)
+
+            self.samples.append((now, *totals))
+            while len(self.samples) > 2 and now - self.samples[1][0] >= self.rate_window:
+                self.samples.popleft()
+
+            oldest = self.samples[0]
+
+        duration = now - oldest[0]
+        if duration <= 0:
+            return {'bytes_in': 0, 'bytes_out': 0, 'messages_in': 0, 'messages_out': 0}
+
+        return {
+            'bytes_in': (totals[0] - oldest[1]) / duration,
+            'bytes_out': (totals[1] - oldest[2]) / duration,
+            'messages_in': (totals[2] - oldest[3]) / duration,
+            'messages_out': (totals[3] - oldest[4]) / duration
+        }
+
+    def snapshot(self):
+        rates = self.rates()
+        with self.lock:
+            return {
+                'rtt': self.rtt,
+                'last_rtt': self.last_rtt,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'messages_in': self.messages_in,
+                'messages_out': self.messages_out,
+                'decode_errors': self.decode_errors,
+                'per_second': rates,
+                'histograms': {direction: {kind: dict(sorted(buckets.items())) for kind, buckets in kinds.items()} for direction, kinds in self.histograms.items()}
+            }
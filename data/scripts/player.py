@@ -1,16 +1,15 @@
 import pygame
 import time
 import math
-from . import bullet
-import threading
+from .assets import load_animation
+from collections import deque
 
-
-def load_animation(path, length):
-    animation = []
-    for i in range(length):
-        image = pygame.image.load(f'{path}{i+1}.png').convert_alpha()
-        animation.append(image)
-    return animation
+# speed and damage of the bullets of every weapon that shoots, the host goes by these and not by what clients send
+BULLETS_SPEED = 30
+WEAPON_BULLETS = {
+    'pistol': (BULLETS_SPEED, 1),
+    'rifle': (BULLETS_SPEED / 2, .5)
+}
 
 
 def to_renderer_position(pos):
@@ -20,7 +19,7 @@ def to_renderer_position(pos):
 
 
 class RemotePlayer:
-    def __init__(self, map, team):
+    def __init__(self, map, team, bullets, owner):
         self.map = map
         self.team = team
         self.center = (4 * 32, 3 * 32)
@@ -38,22 +37,32 @@ class RemotePlayer:
         self.mask = pygame.mask.from_surface(self.image)
 
         self.frame = 0
+        self.visible = True
+
+        # the scene's bullet store and our player id in it, the scene updates and draws the bullets
+        self.bullets = bullets
+        self.owner = owner
 
-        self.bullets = []
-        self.new_bullets = []
+        # snapshots are (time, center, rotation) and get rendered a bit in the past
+        self.snapshots = deque(maxlen=32)
+        self.interpolation_delay = .1
+        self.max_extrapolation = .25
 
     def update(self):
+        self.interpolate()
+
         self.rotated_image = pygame.transform.rotate(self.image, self.rotation)
         self.rect = self.rotated_image.get_rect(center=self.center)
         self.mask = pygame.mask.from_surface(self.rotated_image)
 
-        self.update_bullets()
-
     def render(self, surface: pygame.Surface):
-        surface.blit(self.rotated_image, self.rect)
+        if self.visible:
+            surface.blit(self.rotated_image, self.rect)
 
-        for b in self.bullets:
-            b.render(surface)
+    def hide(self):
+        # the host stopped telling us where this player is, start fresh once it does again
+        self.visible = False
+        self.snapshots.clear()
 
     def set_rotation(self, angle):
         self.rotation = angle
@@ -62,6 +71,50 @@ class RemotePlayer:
         self.center = center
         self.rect.center = center
 
+    def add_snapshot(self, center, rotation, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        if self.snapshots and timestamp <= self.snapshots[-1][0]:
+            return
+
+        self.visible = True
+        self.snapshots.append((timestamp, tuple(center), rotation))
+
+    def interpolate(self):
+        if not self.snapshots:
+            return
+
+        render_time = time.time() - self.interpolation_delay
+
+        # forget everything older than the snapshot right before the render time
+        while len(self.snapshots) > 2 and self.snapshots[1][0] <= render_time:
+            self.snapshots.popleft()
+
+        if len(self.snapshots) == 1 or render_time <= self.snapshots[0][0]:
+            _, center, rotation = self.snapshots[0]
+            self.set_center(center)
+            self.set_rotation(rotation)
+            return
+
+        if render_time <= self.snapshots[1][0]:
+            older, newer = self.snapshots[0], self.snapshots[1]
+        else:
+            # packets are late, keep moving along the last known velocity for a short while
+            older, newer = self.snapshots[-2], self.snapshots[-1]
+            render_time = min(render_time, newer[0] + self.max_extrapolation)
+
+        t = (render_time - older[0]) / (newer[0] - older[0])
+
+        center = (
+            older[1][0] + (newer[1][0] - older[1][0]) * t,
+            older[1][1] + (newer[1][1] - older[1][1]) * t
+        )
+        rotation_difference = (newer[2] - older[2] + 180) % 360 - 180
+
+        self.set_center(center)
+        self.set_rotation(older[2] + rotation_difference * t)
+
     def set_image(self, weapon=None, frame=None):
         if weapon is not None:
             self.active_weapon = weapon
@@ -76,34 +129,15 @@ class RemotePlayer:
         elif self.active_weapon == 'rifle':
             self.image = self.rifle_frames[self.frame]
 
-    def update_bullets(self):
-        to_remove = []
-        for b in self.bullets:
-            b.update()
-            if b.dead:
-                to_remove.append(b)
-
-        for b in to_remove:
-            self.bullets.remove(b)
-
-    def add_bullet(self, direction, center, speed, damage, new=False):
-        b = bullet.Bullet(direction, center, speed, damage, self.map)
-        self.bullets.append(b)
-
-        if new:
-            self.new_bullets.append([direction, center, speed, damage])
+    def add_bullet(self, bullet_id, direction, center, speed, damage, new=False):
+        self.bullets.add_bullet(self.owner, bullet_id, direction, center, speed, damage, new)
 
     def get_new_bullets(self):
-        if len(self.new_bullets) > 0:
-            copy = self.new_bullets[:]
-            self.new_bullets.clear()
-            return copy
-        else:
-            return []
+        return self.bullets.take_spawned(self.owner)
 
 
 class Player:
-    def __init__(self, center, map, team):
+    def __init__(self, center, map, team, bullets, owner=0):
         self.center = center
         self.map = map
         self.team = team
@@ -129,9 +163,10 @@ class Player:
         self.rotation = 0
         self.rotated_image = self.image
 
-        self.bullets = []
-        self.new_bullets = []
-        self.bullets_speed = 30
+        self.bullets = bullets
+        self.owner = owner
+        self.next_bullet_id = 0
+        self.bullets_speed = BULLETS_SPEED
 
         self.active_weapon = 'pistol'
 
@@ -146,14 +181,14 @@ class Player:
         self.pistol_recoil = .5
         self.pistol_max_ammo = 10
         self.pistol_ammo = [self.pistol_max_ammo, self.pistol_max_ammo]
-        self.pistol_damage = 1
+        self.pistol_damage = WEAPON_BULLETS['pistol'][1]
 
         self.rifle_delay = 20
         self.rifle_attack_duration = 5
         self.rifle_recoil = 1
         self.rifle_max_ammo = 30
         self.rifle_ammo = [self.rifle_max_ammo, self.rifle_max_ammo]
-        self.rifle_damage = .5
+        self.rifle_damage = WEAPON_BULLETS['rifle'][1]
 
         self.delay_count = 0
         self.attack_count = 0
@@ -167,9 +202,7 @@ class Player:
         self.max_hearts = 3
         self.hearts = self.max_hearts
 
-        self.damage_taken = []
-
-    def update(self, enemies=None):
+    def update(self):
         self.dt = time.time() - self.last_time
         self.dt *= 120
         self.last_time = time.time()
@@ -232,31 +265,9 @@ class Player:
         self.check_collision_x((self.center[0], old_rect.center[1]), pygame.Rect(self.rect.x, old_rect.y, self.rect.width, old_rect.height))
         self.check_collision_y(self.center, self.rect)
 
-        if enemies:
-            self.check_enemy_bullets(enemies)
-
-        self.update_bullets()
-
     def render(self, surface: pygame.Surface):
         surface.blit(self.rotated_image, self.rect)
 
-        for b in self.bullets:
-            b.render(surface)
-
-    def check_enemy_bullets(self, enemies):
-        for i, enemy in enumerate(enemies):
-            if enemy:
-                for j, bullet in enumerate(enemy.bullets):
-                    if bullet.damage != 0:
-                        if pygame.sprite.collide_mask(self, bullet):
-                            if enemy.team != self.team:
-                                self.damage_taken.append([i, j, bullet.damage])
-                                # self.hearts -= bullet.damage
-                                bullet.damage = 0
-                            else:
-                                bullet.damage = 0
-                                self.damage_taken.append([i, j, bullet.damage])
-
     def attack(self, clicked=False):
         if self.can_attack and (self.ammo[1] != 0 or self.active_weapon == 'knife') and not self.reloading:
             if self.active_weapon != 'rifle':
@@ -273,11 +284,11 @@ class Player:
                 center = (self.center[0] + direction[0] * 30, self.center[1] + direction[1] * 30)
 
                 if self.active_weapon == 'pistol':
-                    self.bullets.append(bullet.Bullet(direction, center, self.bullets_speed, self.pistol_damage, self.map))
-                    self.new_bullets.append([direction, center, self.bullets_speed, self.pistol_damage])
+                    self.bullets.add_bullet(self.owner, self.next_bullet_id, direction, center, self.bullets_speed, self.pistol_damage, True)
                 else:
-                    self.bullets.append(bullet.Bullet(direction, center, self.bullets_speed/2, self.rifle_damage, self.map))
-                    self.new_bullets.append([direction, center, self.bullets_speed/2, self.rifle_damage])
+                    self.bullets.add_bullet(self.owner, self.next_bullet_id, direction, center, self.bullets_speed/2, self.rifle_damage, True)
+
+                self.next_bullet_id += 1
 
                 self.frame = 1
                 self.ammo[1] -= 1
@@ -288,27 +299,12 @@ class Player:
             self.can_attack = False
 
     def get_new_bullets(self):
-        if len(self.new_bullets) > 0:
-            copy = self.new_bullets[:]
-            self.new_bullets.clear()
-            return copy
-        else:
-            return []
+        return self.bullets.take_spawned(self.owner)
 
     def reload(self):
         if self.active_weapon != 'knife':
             self.reloading = True
 
-    def update_bullets(self):
-        to_remove = []
-        for b in self.bullets:
-            threading.Thread(target=b.update).start()
-            if b.dead:
-                to_remove.append(b)
-
-        for b in to_remove:
-            self.bullets.remove(b)
-
     def switch_weapon(self, ind: int):
         if not self.reloading and self.can_attack:
             index = ind
@@ -375,13 +371,6 @@ class Player:
                     self.rect.bottom = t.rect.top
                 self.center = self.rect.center
 
-    def get_damage_taken(self, index: int):
-        for damage in self.damage_taken:
-            damage.append(index)
-        copy = self.damage_taken[:]
-        self.damage_taken.clear()
-        return copy
-
     def go_up(self):
         self.dy = -self.speed
         if self.dx != 0:
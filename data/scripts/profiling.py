@@ -0,0 +1,115 @@
+import threading, time, json, os
+from collections import deque
+
+
+class Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+
+
+class NoPhase:
+    # what phase hands out while the profiler is off, entering and leaving it does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        pass
+
+
+NO_PHASE = NoPhase()
+
+
+class Profiler:
+    def __init__(self, history_size=300):
+        self.enabled = False
+
+        # the last frames as (start, end, [(name, start, end, thread id), ...]), the oldest fall out on their own
+        self.frames = deque(maxlen=history_size)
+
+        # phases can end on other threads (network receive), so they are collected under a lock
+        self.lock = threading.Lock()
+        self.phases = []
+        self.frame_start = None
+
+    def phase(self, name):
+        if not self.enabled:
+            return NO_PHASE
+        return Phase(self, name)
+
+    def add(self, name, start, end):
+        with self.lock:
+            self.phases.append((name, start, end, threading.get_ident()))
+
+    def start_frame(self):
+        if not self.enabled:
+            self.frame_start = None
+            return
+
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+
+        with self.lock:
+            phases = self.phases
+            self.phases = []
+
+        self.frames.append((self.frame_start, time.perf_counter(), phases))
+        self.frame_start = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if not self.enabled:
+            with self.lock:
+                self.phases = []
+
+    def averages(self, frames=60):
+        # average milliseconds per frame of every phase over the last frames, nested phases count on their own too
+        recent = list(self.frames)[-frames:]
+        if not recent:
+            return 0, {}
+
+        totals = {}
+        for _, _, phases in recent:
+            for name, start, end, _ in phases:
+                totals[name] = totals.get(name, 0) + end - start
+
+        frame_time = sum(end - start for start, end, _ in recent) / len(recent) * 1000
+        return frame_time, {name: total / len(recent) * 1000 for name, total in sorted(totals.items(), key=lambda item: -item[1])}
+
+    def export_chrome_trace(self, path):
+        # complete events in microseconds, open the file in chrome://tracing or ui.perfetto.dev
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        frames = list(self.frames)
+        main_thread = threading.main_thread().ident
+        events = []
+        for n, (frame_start, frame_end, phases) in enumerate(frames):
+            events.append({'name': 'frame', 'cat': 'frame', 'ph': 'X', 'ts': frame_start * 1e6, 'dur': (frame_end - frame_start) * 1e6, 'pid': os.getpid(), 'tid': main_thread, 'args': {'frame': n}})
+            for name, start, end, thread in phases:
+                events.append({'name': name, 'cat': 'phase', 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6, 'pid': os.getpid(), 'tid': thread})
+
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+        return len(frames)
+
+
+# one profiler for the whole game, main.py starts and ends the frames and the scenes time their phases with it
+profiler = Profiler()
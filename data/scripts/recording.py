@@ -0,0 +1,145 @@
+import threading, queue, struct, json, mmap, os, bisect, time
+from .logger import log, INFO
+
+# data file: magic, metadata length, metadata json, then one record per tick
+# index file: one fixed size entry per record, so record n always sits at n * INDEX_ENTRY.size
+MAGIC = b'CSLR\x01'
+METADATA_HEADER = struct.Struct('<5sI')
+RECORD_HEADER = struct.Struct('<QdI')
+INDEX_ENTRY = struct.Struct('<QdQI')
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+class Recorder:
+    def __init__(self, path, metadata=None, max_queue_size=256, flush_interval=1):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        metadata = json.dumps(metadata or {}).encode('utf8')
+        self.data_file = open(path, 'wb')
+        self.data_file.write(METADATA_HEADER.pack(MAGIC, len(metadata)) + metadata)
+        self.index_file = open(index_path(path), 'wb')
+        self.offset = self.data_file.tell()
+
+        # the game loop only hands over references, encoding and writing happen on the writer thread.
+        # a full queue means the disk can't keep up, those ticks are skipped instead of piling up in memory
+        self.queue = queue.Queue(max_queue_size)
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.skipped = 0
+
+        self.writer_thread = threading.Thread(target=self.write, daemon=True)
+        self.writer_thread.start()
+
+    def record(self, tick, timestamp, players, events):
+        try:
+            self.queue.put_nowait((tick, timestamp, players, events))
+        except queue.Full:
+            self.skipped += 1
+
+    def write(self):
+        last_flush = time.time()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            tick, timestamp, players, events = item
+            payload = json.dumps({'players': players, 'events': events}).encode('utf8')
+
+            self.data_file.write(RECORD_HEADER.pack(tick, timestamp, len(payload)) + payload)
+            # both files are buffered separately, Replay ignores index entries whose record never made it to disk
+            self.index_file.write(INDEX_ENTRY.pack(tick, timestamp, self.offset, RECORD_HEADER.size + len(payload)))
+            self.offset += RECORD_HEADER.size + len(payload)
+            self.records += 1
+
+            if time.time() - last_flush >= self.flush_interval:
+                self.data_file.flush()
+                self.index_file.flush()
+                last_flush = time.time()
+
+        self.data_file.close()
+        self.index_file.close()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer_thread.join()
+        log(f'recorded {self.records} ticks to {self.path}, skipped {self.skipped}', INFO)
+
+
+class Replay:
+    def __init__(self, path):
+        self.path = path
+
+        self.data_file = open(path, 'rb')
+        self.index_file = open(index_path(path), 'rb')
+
+        self.data = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_size = os.fstat(self.index_file.fileno()).st_size
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ) if index_size else b''
+
+        magic, length = METADATA_HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a match recording')
+        self.metadata = json.loads(self.data[METADATA_HEADER.size:METADATA_HEADER.size + length])
+
+        # a recording that was cut off can end with a half written index entry or record
+        self.length = len(self.index) // INDEX_ENTRY.size
+        while self.length and self.entry(self.length - 1)[2] + self.entry(self.length - 1)[3] > len(self.data):
+            self.length -= 1
+
+        self.first_tick = self.entry(0)[0] if self.length else 0
+
+    def __len__(self):
+        return self.length
+
+    def entry(self, n):
+        return INDEX_ENTRY.unpack_from(self.index, n * INDEX_ENTRY.size)
+
+    def frame(self, n):
+        if not 0 <= n < self.length:
+            raise IndexError(f'frame {n} is not in the recording')
+
+        _, _, offset, size = self.entry(n)
+        tick, timestamp, length = RECORD_HEADER.unpack_from(self.data, offset)
+        start = offset + RECORD_HEADER.size
+        return tick, timestamp, json.loads(self.data[start:start + length])
+
+    def find_tick(self, tick):
+        # ticks are consecutive unless the recorder had to skip some, so the guess is almost always right
+        n = min(max(tick - self.first_tick, 0), self.length - 1)
+        if n < 0 or self.entry(n)[0] == tick:
+            return n
+
+        ticks = IndexColumn(self, 0)
+        return min(bisect.bisect_left(ticks, tick), self.length - 1)
+
+    def find_time(self, timestamp):
+        times = IndexColumn(self, 1)
+        return min(bisect.bisect_left(times, timestamp), self.length - 1)
+
+    def close(self):
+        self.data.close()
+        if self.index:
+            self.index.close()
+        self.data_file.close()
+        self.index_file.close()
+
+
+class IndexColumn:
+    # lets bisect search one column of the index without reading all of it
+    def __init__(self, replay, column):
+        self.replay = replay
+        self.column = column
+
+    def __len__(self):
+        return len(self.replay)
+
+    def __getitem__(self, n):
+        return self.replay.entry(n)[self.column]
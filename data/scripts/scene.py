@@ -1,23 +1,12 @@
-import pygame, threading, json, random, logging
-from . import player, map, shadow_caster, hud, menu
-from socket import AF_INET, socket, SOCK_STREAM
-
-
-logging.basicConfig(
-    filename='data/logs/session.log',
-    filemode='w',
-    format='%(asctime)s %(levelname)s: %(message)s',
-    datefmt='%d.%m.%y %H:%M:%S',
-    level=logging.DEBUG
-)
-
-
-def log(message):
-    logging.debug(f'{message}')
+import pygame, threading, json, time
+from . import player, bullet, map, shadow_caster, layers, fonts, hud, menu, server, world, connection, recording, network_stats, lazy, assets
+from .logger import log, INFO, WARNING
+from .profiling import profiler
+from socket import AF_INET, socket, SOCK_STREAM, SOCK_DGRAM
 
 
 class MainScene:
-    def __init__(self, map_path, team):
+    def __init__(self, map_path, team, own_id=0):
         self.colors = {
             'background': (125, 112, 113),
             'text': (223, 246, 245),
@@ -32,36 +21,108 @@ class MainScene:
         self.render_width, self.render_height = 1024, 576
         self.render_dimensions = (self.render_width, self.render_height)
 
-        self.font = pygame.font.Font('data/font/font.ttf', 15)
+        self.text_cache = fonts.get('data/font/font.ttf', 15)
         self.render_surface = pygame.Surface(self.render_dimensions)
 
         self.map = map.Map(map_path)
 
-        self.player = player.Player((4 * 32, 3 * 32), self.map, team)
+        # the bullets of everybody, updated once per frame after all players moved
+        self.bullets = bullet.Bullets(self.map)
+
+        self.player = player.Player((4 * 32, 3 * 32), self.map, team, self.bullets, own_id)
 
         self.shadow_caster = shadow_caster.ShadowCaster(self.player, self.map, self.colors['shadows'])
+        self.static_layer = layers.StaticLayer(self.map, self.shadow_caster, self.colors['background'], self.render_dimensions)
 
         self.hud = hud.Hud(self.player)
 
-    def update(self, surface, input):
-        self.render_surface.fill(self.colors['background'])
+        # F3 shows round trip times, traffic and message sizes of every connection
+        self.network_overlay = hud.NetworkOverlay()
+        self.show_network_overlay = False
 
-        self.handle_input(input)
+        # regions of the render surface that changed in the last update, None means all of it
+        self.dirty_rects = None
+        self.drawn_shadow_version = None
+        self.last_rects = []
+        self.text_rects = []
+
+    def update(self, surface, input):
+        with profiler.phase('input'):
+            self.handle_input(input)
 
         # update
-        self.player.update()
-        self.shadow_caster.update()
-        self.hud.update()
+        with profiler.phase('player.update'):
+            self.player.update()
+        with profiler.phase('bullets.update'):
+            self.bullets.update()
+        self.update_shadows_and_hud()
 
         # render
-        self.shadow_caster.render(self.render_surface)
-        self.map.draw(self.render_surface)
-        self.player.render(self.render_surface)
-        self.hud.render(self.render_surface)
+        with profiler.phase('render.static_layer'):
+            self.static_layer.render(self.render_surface)
+        self.render_player()
+        with profiler.phase('render.hud'):
+            self.hud.render(self.render_surface)
+
+        self.render_text()
+
+        with profiler.phase('render.blit'):
+            surface.blit(self.render_surface, (0, 0))
+
+        self.find_dirty_rects()
+
+    def update_shadows_and_hud(self):
+        with profiler.phase('shadow_caster.update'):
+            self.shadow_caster.update()
+        with profiler.phase('static_layer.update'):
+            self.static_layer.update()
+        with profiler.phase('hud.update'):
+            self.hud.update()
+
+    def render_text(self, get_network_stats=None):
+        with profiler.phase('render.text'):
+            self.text_rects = []
+            if self.show_network_overlay and get_network_stats:
+                self.network_overlay.update(get_network_stats())
+                overlay_rect = self.network_overlay.render(self.render_surface)
+                if overlay_rect:
+                    self.text_rects.append(overlay_rect)
+
+            self.text_rects.append(self.text_cache.blit(self.render_surface, 'rotation: ' + str(round(self.player.rotation, 2)), (85, 5), self.colors['text']))
+
+    def render_player(self):
+        with profiler.phase('render.player'):
+            self.player.render(self.render_surface)
+            self.bullets.render(self.render_surface, self.bullets.owned_by(self.player.owner))
+
+    def render_hidden_players(self, players):
+        # everybody else is drawn below the shadows and the map, so walls and shadows hide them
+        rects = []
+        for p in players:
+            p.render(self.render_surface)
+            rects.append(p.rect)
 
-        self.render_surface.blit(self.font.render('rotation: ' + str(round(self.player.rotation, 2)), True, self.colors['text']), (85, 5))
+        others = self.bullets.not_owned_by(self.player.owner)
+        self.bullets.render(self.render_surface, others)
+        rects += self.bullets.rects(others)
 
-        surface.blit(self.render_surface, (0, 0))
+        self.static_layer.cover(self.render_surface, rects)
+
+    def find_dirty_rects(self, players=()):
+        # everything that can change while the shadows stay the same, plus where it was last frame
+        rects = [self.player.rect.copy()] + self.bullets.rects()
+        for p in players:
+            rects.append(p.rect.copy())
+        rects += self.hud.rects + self.text_rects
+
+        if self.shadow_caster.version != self.drawn_shadow_version:
+            # new shadows can reach every corner of the screen
+            self.drawn_shadow_version = self.shadow_caster.version
+            self.dirty_rects = None
+        else:
+            self.dirty_rects = self.last_rects + rects
+
+        self.last_rects = rects
 
     def handle_input(self, input):
         for event in input:
@@ -79,6 +140,8 @@ class MainScene:
                     self.player.switch_weapon(3)
                 elif event.key == pygame.K_r:
                     self.player.reload()
+                elif event.key == pygame.K_F3:
+                    self.show_network_overlay = not self.show_network_overlay
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
@@ -107,199 +170,60 @@ class MainScene:
             self.player.attack()
 
 
-class HostScene(MainScene):
+class HostScene(MainScene, server.HostSession):
     def __init__(self, port: int, path, name, teams, own_team):
         MainScene.__init__(self, path, own_team)
+        # like the session log, the recording of the last hosted match gets replaced by the next one
+        server.HostSession.__init__(self, port, path, name, teams, record='data/recordings/match.rec')
 
-        self.name = name
-        self.teams = teams
         self.own_team = own_team
 
-        self.map_path = path
-        self.message_splitter = ''.join(chr(random.randint(33, 126)) for _ in range(10))
-
-        self.clients = {}
-        self.addresses = {}
-        self.player_dictionary = {}
-        self.player_list = []
-
-        self.ip = ''
-        self.port = port
-        self.buffer_size = 1024
-        self.address = (self.ip, self.port)
-
-        self.server = socket(AF_INET, SOCK_STREAM)
-        self.server.bind(self.address)
-
-        self.server.listen()
-
-        self.accept_thread = threading.Thread(target=self.accept_new_connections)
-        self.accept_thread.start()
-
     def update(self, surface, input):
-        self.render_surface.fill(self.colors['background'])
+        with profiler.phase('network.apply'):
+            self.apply_network_state()
 
-        self.handle_input(input)
+        with profiler.phase('input'):
+            self.handle_input(input)
 
         # update
-        self.player.update(self.player_list)
+        with profiler.phase('player.update'):
+            self.player.update()
 
-        for p in self.player_list:
-            p.update()
+        with profiler.phase('players.update'):
+            for p in self.players.values():
+                p.update()
 
-        if len(self.player.damage_taken) > 0:
-            damage_taken = self.player.get_damage_taken(0)
-            for one_damage in damage_taken:
-                enemy, bullet, damage, victim = one_damage
-                self.player.hearts -= damage
-                self.player_list[enemy].bullets.pop(bullet)
-                one_damage[0] += 1
+        with profiler.phase('bullets.update'):
+            self.bullets.update()
 
-            self.broadcast(self.build_message({'damage': damage_taken}))
+        with profiler.phase('hits'):
+            self.record_positions()
+            self.resolve_hits()
 
-        self.shadow_caster.update()
-        self.hud.update()
+        self.update_shadows_and_hud()
 
-        info = {
-            'players': [[self.player.center, self.player.rotation, self.player.active_weapon, self.player.frame, self.player.get_new_bullets(), self.player.team, self.player.hearts]] + [[p.center, p.rotation, p.active_weapon, p.frame, p.get_new_bullets(), p.team, p.hearts] for p in self.player_list]
-        }
-        self.broadcast(self.build_message(info))
+        with profiler.phase('network.send'):
+            self.send_pings()
+            self.send_players(self.player_states())
 
         # render
-        for p in self.player_list:
-            p.render(self.render_surface)
-
-        self.shadow_caster.render(self.render_surface)
-        self.map.draw(self.render_surface)
-        self.player.render(self.render_surface)
-        self.hud.render(self.render_surface)
-
-        self.render_surface.blit(self.font.render('rotation: ' + str(round(self.player.rotation, 2)), True, self.colors['text']), (85, 5))
-
-        surface.blit(self.render_surface, (0, 0))
-
-    def accept_new_connections(self):
-        while True:
-            try:
-                client, client_address = self.server.accept()
-                log(f'{client_address[0]}:{client_address[1]} has connected')
-                self.addresses[client] = client_address
+        with profiler.phase('render.static_layer'):
+            self.static_layer.render(self.render_surface)
+        with profiler.phase('render.players'):
+            self.render_hidden_players(self.players.values())
+        self.render_player()
+        with profiler.phase('render.hud'):
+            self.hud.render(self.render_surface)
 
-                threading.Thread(target=self.handle_client, args=(client,)).start()
-            except OSError:
-                break
-
-    def handle_client(self, client):
-        client_index = len(self.player_list)
-        client_index_whole_list = client_index + 1
-
-        info = {
-            'name': self.name,
-            'teams': self.teams,
-            'names': [n for n in self.clients.values()],
-            'map': self.map_path,
-            'message_splitter': self.message_splitter,
-            'own_index': client_index_whole_list,
-            'players': [[self.player.center, self.player.rotation, self.player.active_weapon, self.player.frame, self.player.team, self.player.hearts]] + [[p.center, p.rotation, p.active_weapon, p.frame, p.team, p.hearts] for p in self.player_list]
-        }
-
-        info = json.dumps(info)
-        client.send(bytes(info, 'utf8'))
-
-        client_session_info = client.recv(self.buffer_size).decode('utf8')
-
-        if client_session_info == 'ping' or client_session_info == '':
-            log(f'got ping request from {self.addresses[client]}')
-            del self.addresses[client]
-            client.close()
-            return
-
-        client_session_info = json.loads(client_session_info.split(self.message_splitter)[0])
-
-        new_player = player.RemotePlayer(self.map, client_session_info['team'])
-        self.player_list.append(new_player)
-        self.player_dictionary[client] = new_player
+        self.render_text(self.network_stats)
 
-        self.clients[client] = client_session_info['name']
+        with profiler.phase('render.blit'):
+            surface.blit(self.render_surface, (0, 0))
 
-        while True:
-            try:
-                msg = client.recv(self.buffer_size)
-                if msg != bytes("{quit}", "utf8"):
-                    decoded_message = msg.decode('utf8')
-                    dict = decoded_message.split(self.message_splitter)[0]
-                    client_info = json.loads(dict)
-
-                    if 'player' in client_info:
-                        new_player.set_center(client_info['player']['center'])
-                        new_player.set_rotation(client_info['player']['rotation'])
-                        new_player.set_image(client_info['player']['weapon'], client_info['player']['frame'])
-                        for bullet in client_info['player']['bullets']:
-                            new_player.add_bullet(*bullet, True)
-
-                    if 'index' in client_info:
-                        client_index_whole_list = client_info['index']
-                        client_index = client_index_whole_list - 1
-
-                    if 'damage' in client_info:
-                        self.broadcast(dict)
-                        log('got damage message fom player')
-                        for one_damage in client_info['damage']:
-                            enemy, bullet, damage, victim = one_damage
-                            if enemy == 0:
-                                self.player.bullets.pop(bullet)
-                            else:
-                                self.player_list[enemy - 1].bullets.pop(bullet)
-
-                            new_player.hearts -= damage
-
-                else:
-                    self.player_list.pop(client_index)
-                    client.close()
-                    del self.clients[client]
-                    disconnection_info = {'disconnect': client_index_whole_list}
-                    self.broadcast(self.build_message(disconnection_info))
-                    log(f'{self.addresses[client]} disconnected')
-                    break
-
-            except json.JSONDecodeError as e:
-                log(f'Error receiving data from {self.addresses[client]}')
-                log(dict)
-                log(e)
-                pass
-
-            except OSError as e:
-                log('connection failed')
-                #log(e)
-                self.player_list.pop(client_index)
-                client.close()
-                del self.clients[client]
-                disconnection_info = {'disconnect': client_index_whole_list}
-                self.broadcast(self.build_message(disconnection_info))
-                log(f'{self.addresses[client]} lost connection')
-                break
+        self.find_dirty_rects(self.players.values())
 
-    def build_message(self, message: dict):
-        return json.dumps(message) + self.message_splitter
-
-    def broadcast(self, message: str):  # prefix is for name identification.
-        message_bytes = bytes(message, 'utf8')
-        try:
-            for sock in self.clients:
-                sock.send(message_bytes)
-
-        except OSError as e:
-            log('error broadcasting to one client')
-            log(e)
-
-        except RuntimeError as e:
-            log('deleted client while broadcasting')
-            log(e)
-
-    def stop(self):
-        for sock in self.clients:
-            sock.close()
-        self.server.close()
+    def local_players(self):
+        return {0: self.player}
 
 
 class ClientScene(MainScene):
@@ -323,64 +247,88 @@ class ClientScene(MainScene):
 
         self.connected = True
 
-        info = self.client_socket.recv(self.buffer_size).decode("utf8")
-        info = json.loads(info)
+        # the receive thread answers pings while the game loop sends the player, one message at a time
+        self.send_lock = threading.Lock()
+
+        hello = {'compression': connection.COMPRESSION_METHODS}
+        if 'match' in self.client_info:
+            # only a match host looks at this, a single session ignores it
+            hello['match'] = self.client_info['match']
+        self.client_socket.sendall(bytes(json.dumps(hello), 'utf8'))
+
+        info = json.loads(connection.receive_handshake(self.client_socket))
 
         path = info['map']
         self.message_splitter = info['message_splitter']
-        self.own_index = info['own_index']
+
+        self.connection_stats = network_stats.NetworkStats()
+        self.reader = connection.MessageReader(self.message_splitter, self.connection_stats)
+        self.ping_interval = 1
+        self.last_ping = 0
+        self.own_id = info['own_id']
+
+        self.server_time_offset = None
+
+        # the receive thread only writes into this buffer, update applies it once per frame
+        self.world = world.WorldBuffer()
 
         receive_thread = threading.Thread(target=self.receive)
         receive_thread.start()
 
-        MainScene.__init__(self, path, client_info['team'])
+        MainScene.__init__(self, path, client_info['team'], self.own_id)
 
-        self.player_list = []
-        for i, p in enumerate(info['players']):
-            if i != self.own_index:
-                new_player = player.RemotePlayer(self.map, p[4])
-                new_player.set_center(p[0])
-                new_player.set_rotation(p[1])
-                new_player.set_image(p[2], p[3])
-                self.player_list.append(new_player)
+        # remote players by their id, our own player is not part of it
+        self.players = {}
+        for player_id, center, rotation, weapon, frame, team, hearts in info['players']:
+            new_player = player.RemotePlayer(self.map, team, self.bullets, player_id)
+            if center is None:
+                new_player.hide()
             else:
-                self.player_list.append(None)
+                new_player.set_center(center)
+                new_player.set_rotation(rotation)
+                new_player.set_image(weapon, frame)
+            self.players[player_id] = new_player
 
         self.send(self.build_message(self.client_info))
 
     def update(self, surface, input):
-        self.render_surface.fill(self.colors['background'])
+        with profiler.phase('network.apply'):
+            self.apply_network_state()
 
-        self.handle_input(input)
+        with profiler.phase('input'):
+            self.handle_input(input)
 
         # update
-        self.player.update(self.player_list)
+        with profiler.phase('player.update'):
+            self.player.update()
 
-        for i, p in enumerate(self.player_list):
-            if i != self.own_index:
+        with profiler.phase('players.update'):
+            for p in self.players.values():
                 p.update()
 
-        if len(self.player.damage_taken) > 0:
-            self.send(self.build_message({'damage': self.player.get_damage_taken(self.own_index)}))
+        with profiler.phase('bullets.update'):
+            self.bullets.update()
 
-        self.shadow_caster.update()
-        self.hud.update()
+        self.update_shadows_and_hud()
 
-        self.send_info()
+        with profiler.phase('network.send'):
+            self.send_info()
 
         # render
-        for i, p in enumerate(self.player_list):
-            if i != self.own_index:
-                p.render(self.render_surface)
+        with profiler.phase('render.static_layer'):
+            self.static_layer.render(self.render_surface)
+        with profiler.phase('render.players'):
+            self.render_hidden_players(self.players.values())
+        self.render_player()
+        with profiler.phase('render.hud'):
+            self.hud.render(self.render_surface)
 
-        self.shadow_caster.render(self.render_surface)
-        self.map.draw(self.render_surface)
-        self.player.render(self.render_surface)
-        self.hud.render(self.render_surface)
+        self.render_text(self.network_stats)
 
-        self.render_surface.blit(self.font.render('rotation: ' + str(round(self.player.rotation, 2)), True, self.colors['text']), (85, 5))
+        with profiler.phase('render.blit'):
+            surface.blit(self.render_surface, (0, 0))
 
-        surface.blit(self.render_surface, (0, 0))
+        self.find_dirty_rects(self.players.values())
 
         if self.player.hearts <= 0:
             self.stop()
@@ -390,70 +338,117 @@ class ClientScene(MainScene):
         while self.connected:
             try:
                 msg = self.client_socket.recv(self.buffer_size)
-                decoded_message = msg.decode('utf8')
-                dict = decoded_message.split(self.message_splitter)[0]
-                if msg != bytes("{quit}", "utf8"):
-                    info_from_server = json.loads(dict)
+            except OSError:
+                log('connection failed', WARNING)
+                break
+
+            if msg == b'':
+                log('host closed the connection', INFO)
+                break
+
+            # one recv can hold several messages or only part of one, some of them compressed
+            with profiler.phase('network.receive'):
+                for message in self.reader.feed(msg):
+                    try:
+                        info_from_server = json.loads(message)
+                    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                        self.connection_stats.decode_error()
+                        log('Error receiving data from server:', WARNING)
+                        log(message)
+                        log(e, WARNING)
+                        continue
+
+                    # answer right away so the host measures the network and not our frame rate
+                    if 'ping' in info_from_server:
+                        try:
+                            self.send(self.build_message({'pong': info_from_server['ping']}))
+                        except OSError:
+                            log('connection failed', WARNING)
+                            return
+
+                    if 'pong' in info_from_server:
+                        self.connection_stats.add_rtt(time.time() - info_from_server['pong'])
 
-                    # update players
                     if 'players' in info_from_server:
-                        players = info_from_server['players']
-                        for i, p in enumerate(players):
-                            if i >= len(self.player_list):
-                                new_player = player.RemotePlayer(self.map, p[5])
-                                new_player.set_center(p[0])
-                                new_player.set_rotation(p[1])
-                                new_player.set_image(p[2], p[3])
-                                for b in p[4]:
-                                    new_player.add_bullet(*b)
-                                self.player_list.append(new_player)
-                            elif i != self.own_index:
-                                self.player_list[i].set_center(p[0])
-                                self.player_list[i].set_rotation(p[1])
-                                self.player_list[i].set_image(p[2], p[3])
-                                for b in p[4]:
-                                    self.player_list[i].add_bullet(*b)
-
-                    # remove a player
+                        timestamp = self.to_local_time(info_from_server.get('time'))
+                        self.world.post(('players', timestamp, info_from_server['players']))
+
                     if 'disconnect' in info_from_server:
-                        index = info_from_server['disconnect']
-                        self.player_list.pop(index)
-                        if index < self.own_index:
-                            self.own_index -= 1
-                            index_info = {'index': self.own_index}
-                            self.send(self.build_message(index_info))
-
-                    # handle hit
+                        self.world.post(('disconnect', info_from_server['disconnect']))
+
                     if 'damage' in info_from_server:
                         log('got damage message from server')
-                        for one_damage in info_from_server['damage']:
-                            log('containing damage')
-                            enemy, bullet, damage, victim = one_damage
-                            if enemy == self.own_index:
-                                self.player.bullets.pop(bullet)
-                            else:
-                                self.player_list[enemy].bullets.pop(bullet)
-
-                            if victim == self.own_index:
-                                self.player.hearts -= damage
-                            else:
-                                self.player_list[victim].hearts -= damage
-
-            except json.JSONDecodeError as e:
-                log('Error receiving data from server:')
-                log(dict)
-                log(e)
-                pass
-
-            except OSError:
-                log('connection failed')
-                break
+                        self.world.post(('damage', info_from_server['damage']))
+
+    def apply_network_state(self):
+        state = self.world.swap()
+
+        for event in state.events:
+            # update players
+            if event[0] == 'players':
+                _, timestamp, players = event
+                for player_id, center, rotation, weapon, frame, bullets, team, hearts in players:
+                    if player_id == self.own_id:
+                        continue
+
+                    if player_id not in self.players:
+                        new_player = player.RemotePlayer(self.map, team, self.bullets, player_id)
+                        if center is not None:
+                            new_player.set_center(center)
+                            new_player.set_rotation(rotation)
+                        self.players[player_id] = new_player
+
+                    p = self.players[player_id]
+                    if center is None:
+                        p.hide()
+                    else:
+                        p.add_snapshot(center, rotation, timestamp)
+                        p.set_image(weapon, frame)
+                    for b in bullets:
+                        p.add_bullet(*b)
+
+            # remove a player
+            elif event[0] == 'disconnect':
+                self.players.pop(event[1], None)
+                self.bullets.remove_owner(event[1])
+
+            # handle hit
+            elif event[0] == 'damage':
+                for one_damage in event[1]:
+                    log('containing damage')
+                    enemy, bullet_id, damage, victim = one_damage
+                    # bullets of hidden players might never have reached us
+                    self.bullets.remove((enemy, bullet_id))
+
+                    if victim == self.own_id:
+                        self.player.hearts -= damage
+                    elif victim in self.players:
+                        self.players[victim].hearts -= damage
+
+    def to_local_time(self, server_time):
+        now = time.time()
+        if server_time is None:
+            return now
+
+        # the smallest offset seen belongs to the fastest packet, so it is the best guess for the clock difference
+        offset = now - server_time
+        if self.server_time_offset is None or offset < self.server_time_offset:
+            self.server_time_offset = offset
+
+        return server_time + self.server_time_offset
 
     def send(self, message):
-        self.client_socket.send(bytes(message, "utf8"))
+        data = bytes(message, "utf8")
+        with self.send_lock:
+            self.client_socket.sendall(data)
+        self.connection_stats.sent(data)
 
     def send_info(self):
         if self.connected:
+            if time.time() - self.last_ping >= self.ping_interval:
+                self.last_ping = time.time()
+                self.send(self.build_message({'ping': self.last_ping}))
+
             info = {
                 'player': {
                     'center': self.player.center,
@@ -469,12 +464,161 @@ class ClientScene(MainScene):
         msg = json.dumps(message) + self.message_splitter
         return msg
 
+    def network_stats(self):
+        return {'host': self.connection_stats.snapshot()}
+
     def stop(self):
         self.send('{quit}')
         self.client_socket.close()
         self.connected = False
 
 
+class ReplayScene:
+    def __init__(self, path, start_tick=None):
+        self.colors = {
+            'background': (125, 112, 113),
+            'text': (223, 246, 245),
+            'shadows': (48, 44, 46)
+        }
+
+        self.next_scene = None
+
+        self.render_width, self.render_height = 1024, 576
+        self.render_dimensions = (self.render_width, self.render_height)
+
+        self.text_cache = fonts.get('data/font/font.ttf', 15)
+        self.render_surface = pygame.Surface(self.render_dimensions)
+
+        self.replay = recording.Replay(path)
+        self.map = map.Map(self.replay.metadata['map'])
+        self.bullets = bullet.Bullets(self.map)
+
+        self.players = {}
+        self.names = {}
+
+        # (frame, player id, name) of every join, read from the recording only as far as seeking needed it
+        self.joins = []
+        self.joins_read = 0
+
+        self.speed = 1
+        self.paused = False
+        self.seek_step = 5
+
+        self.frame = self.replay.find_tick(start_tick) if start_tick is not None else 0
+        self.seek(self.frame)
+
+    def seek(self, frame):
+        self.start_time = time.time()
+        self.start_frame_time = 0
+        if not len(self.replay):
+            return
+
+        jumped = frame != self.frame
+        self.frame = min(max(frame, 0), len(self.replay) - 1)
+        self.start_frame_time = self.replay.entry(self.frame)[1]
+
+        if jumped or not self.players:
+            # bullets only exist from the tick they were fired in, after a jump the old ones would be wrong
+            self.bullets.clear()
+
+            # players joined somewhere before this frame, their names come from the joins up to it
+            self.read_joins(self.frame)
+            self.names = {player_id: name for n, player_id, name in self.joins if n < self.frame}
+
+            # every frame holds the full state of all players, so one frame is enough to continue from
+            self.apply_frame(self.frame)
+
+    def read_joins(self, frame):
+        while self.joins_read <= frame:
+            for event in self.replay.frame(self.joins_read)[2]['events']:
+                if event[0] == 'join':
+                    self.joins.append((self.joins_read, event[1], event[2]))
+            self.joins_read += 1
+
+    def update(self, surface, input):
+        self.render_surface.fill(self.colors['background'])
+
+        self.handle_input(input)
+
+        if len(self.replay) and not self.paused:
+            # play in real time, skipping frames if rendering is slower than the recorded tick rate
+            frame_time = self.start_frame_time + (time.time() - self.start_time) * self.speed
+            frame = self.replay.find_time(frame_time)
+            while self.frame < frame:
+                self.frame += 1
+                self.apply_frame(self.frame)
+
+        for p in self.players.values():
+            p.update()
+        self.bullets.update()
+
+        # render
+        self.map.draw(self.render_surface)
+        for player_id, p in self.players.items():
+            p.render(self.render_surface)
+            self.bullets.render(self.render_surface, self.bullets.owned_by(player_id))
+            name = self.names.get(player_id, str(player_id))
+            self.text_cache.blit(self.render_surface, f'{name} {p.hearts}', (p.rect.left, p.rect.top - 15), self.colors['text'])
+
+        tick = self.replay.entry(self.frame)[0] if len(self.replay) else 0
+        status = f'tick {tick}  frame {self.frame + 1}/{len(self.replay)}  speed {self.speed}x' + ('  paused' if self.paused else '')
+        self.text_cache.blit(self.render_surface, status, (85, 5), self.colors['text'])
+
+        surface.blit(self.render_surface, (0, 0))
+
+    def apply_frame(self, n):
+        _, _, frame = self.replay.frame(n)
+
+        for event in frame['events']:
+            if event[0] == 'join':
+                self.names[event[1]] = event[2]
+            elif event[0] == 'leave':
+                self.players.pop(event[1], None)
+                self.bullets.remove_owner(event[1])
+            elif event[0] == 'damage':
+                for shooter, bullet_id, damage, victim in event[1]:
+                    self.bullets.remove((shooter, bullet_id))
+
+        seen = set()
+        for player_id, center, rotation, weapon, frame_index, bullets, team, hearts in frame['players']:
+            seen.add(player_id)
+            p = self.players.get(player_id)
+            if p is None:
+                p = self.players[player_id] = player.RemotePlayer(self.map, team, self.bullets, player_id)
+
+            p.set_center(center)
+            p.set_rotation(rotation)
+            p.set_image(weapon, frame_index)
+            p.hearts = hearts
+            for b in bullets:
+                p.add_bullet(*b)
+
+        for player_id in list(self.players):
+            if player_id not in seen:
+                del self.players[player_id]
+                self.bullets.remove_owner(player_id)
+
+    def handle_input(self, input):
+        for event in input:
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    self.paused = not self.paused
+                    self.seek(self.frame)
+                elif event.key == pygame.K_RIGHT:
+                    self.seek(self.replay.find_time(self.replay.entry(self.frame)[1] + self.seek_step))
+                elif event.key == pygame.K_LEFT:
+                    self.seek(self.replay.find_time(self.replay.entry(self.frame)[1] - self.seek_step))
+                elif event.key == pygame.K_UP:
+                    self.speed = min(self.speed * 2, 8)
+                    self.seek(self.frame)
+                elif event.key == pygame.K_DOWN:
+                    self.speed = max(self.speed / 2, .25)
+                    self.seek(self.frame)
+
+    def stop(self):
+        self.replay.close()
+
+
 class MenuScene:
     def __init__(self, menu):
         self.colors = {
@@ -489,20 +633,30 @@ class MenuScene:
         self.render_width, self.render_height = 1024, 576
         self.render_dimensions = (self.render_width, self.render_height)
 
-        self.font = pygame.font.Font('data/font/font.ttf', 15)
+        self.text_cache = fonts.get('data/font/font.ttf', 15)
         self.render_surface = pygame.Surface(self.render_dimensions)
 
         self.menu = menu
 
         self.next_scene = None
 
+        # regions of the render surface that changed in the last update, None means all of it
+        self.dirty_rects = None
+
 
 class MainMenuScene(MenuScene):
     def __init__(self):
-        self.input_image = pygame.image.load('data/sprites/icons/menu_input.png')
-        self.host_image = pygame.image.load('data/sprites/icons/menu_button_host.png')
-        self.join_image = pygame.image.load('data/sprites/icons/menu_button_join.png')
-        self.settings_image = pygame.image.load('data/sprites/icons/menu_button_settings.png')
+        # nobody can host or join before scipy and shapely are needed, load them while the menu is up
+        lazy.preload()
+
+        # same for sprites and fonts, HostScene and ClientScene then find them ready
+        self.preloader = assets.preload()
+        self.shown_progress = None
+
+        self.input_image = assets.load_image('data/sprites/icons/menu_input.png')
+        self.host_image = assets.load_image('data/sprites/icons/menu_button_host.png')
+        self.join_image = assets.load_image('data/sprites/icons/menu_button_join.png')
+        self.settings_image = assets.load_image('data/sprites/icons/menu_button_settings.png')
 
         self.menu_content = [
             menu.Button('host', self.host_image.get_rect(), image=self.host_image),
@@ -523,8 +677,6 @@ class MainMenuScene(MenuScene):
         MenuScene.__init__(self, self.menu)
 
     def update(self, surface, input):
-        self.render_surface.fill(self.colors['background'])
-
         self.handle_input(input)
 
         # update
@@ -532,10 +684,25 @@ class MainMenuScene(MenuScene):
 
         self.handle_menu_actions()
 
-        # render stuff
-        self.menu.render(self.render_surface)
+        progress = round(self.preloader.progress() * 100)
+        if progress != self.shown_progress:
+            self.shown_progress = progress
+            self.menu.dirty = True
 
-        surface.blit(self.render_surface, (0, 0))
+        # render stuff, a menu only looks different after some input
+        if self.menu.dirty:
+            self.render_surface.fill(self.colors['background'])
+            self.menu.render(self.render_surface)
+
+            if not self.preloader.done:
+                self.text_cache.blit(self.render_surface, f'loading {progress}%', (5, self.render_height - 25), self.colors['text'])
+
+            surface.blit(self.render_surface, (0, 0))
+
+            self.menu.dirty = False
+            self.dirty_rects = None
+        else:
+            self.dirty_rects = []
 
     def handle_menu_actions(self):
         if self.menu.get_pressed('join'):
@@ -567,6 +734,13 @@ class MainMenuScene(MenuScene):
             test_server.listen()
             test_server.close()
 
+            # the session answers status queries over udp on the same port
+            test_status = socket(AF_INET, SOCK_DGRAM)
+            try:
+                test_status.bind(test_address)
+            finally:
+                test_status.close()
+
         except ValueError as e:
             log('host port not an int')
             # log(e)
@@ -594,17 +768,13 @@ class MainMenuScene(MenuScene):
                 self.host_connect_error = True
 
         else:
-            log('creating new session')
+            log('creating new session', INFO)
             self.next_scene = CreateHostScene(int(self.menu.get_text('host port')))
 
     def test_join(self):
         try:
             test_address = (self.menu.get_text('ip').strip(), int(self.menu.get_text('port').strip()))
-            test_socket = socket(AF_INET, SOCK_STREAM)
-            test_socket.connect(test_address)
-            session_info = json.loads(test_socket.recv(1024).decode('utf8'))
-            test_socket.send(bytes('ping', "utf8"))
-            test_socket.close()
+            session_info = server.query_status(test_address)
 
         except ValueError as e:
             log('port not an int')
@@ -633,7 +803,7 @@ class MainMenuScene(MenuScene):
                 self.join_connect_error = True
 
         else:
-            log('found game session')
+            log('found game session', INFO)
             self.next_scene = CreateJoinScene(test_address, session_info)
 
     def handle_input(self, input):
@@ -650,8 +820,8 @@ class CreateHostScene(MenuScene):
     def __init__(self, port):
         self.port = port
 
-        self.input_image = pygame.image.load('data/sprites/icons/menu_input.png')
-        self.host_image = pygame.image.load('data/sprites/icons/menu_button_host.png')
+        self.input_image = assets.load_image('data/sprites/icons/menu_input.png')
+        self.host_image = assets.load_image('data/sprites/icons/menu_button_host.png')
 
         self.menu_content = [
             menu.Input('your player name', self.input_image.get_rect(), image=self.input_image),
@@ -673,8 +843,6 @@ class CreateHostScene(MenuScene):
         MenuScene.__init__(self, self.menu)
 
     def update(self, surface, input):
-        self.render_surface.fill(self.colors['background'])
-
         self.handle_input(input)
 
         # update
@@ -682,10 +850,17 @@ class CreateHostScene(MenuScene):
 
         self.handle_menu_actions()
 
-        # render stuff
-        self.menu.render(self.render_surface)
+        # render stuff, a menu only looks different after some input
+        if self.menu.dirty:
+            self.render_surface.fill(self.colors['background'])
+            self.menu.render(self.render_surface)
 
-        surface.blit(self.render_surface, (0, 0))
+            surface.blit(self.render_surface, (0, 0))
+
+            self.menu.dirty = False
+            self.dirty_rects = None
+        else:
+            self.dirty_rects = []
 
     def handle_menu_actions(self):
         if self.menu.get_pressed('host'):
@@ -776,8 +951,8 @@ class CreateJoinScene(MenuScene):
         host_name = session_info['name']
         teams_string = 'teams: ' + ''.join([t + ', ' for t in session_info['teams']])[:-2]
 
-        self.input_image = pygame.image.load('data/sprites/icons/menu_input.png')
-        self.join_image = pygame.image.load('data/sprites/icons/menu_button_join.png')
+        self.input_image = assets.load_image('data/sprites/icons/menu_input.png')
+        self.join_image = assets.load_image('data/sprites/icons/menu_button_join.png')
 
         self.menu_content = [
             menu.Input('your player name', self.input_image.get_rect(), image=self.input_image),
@@ -797,8 +972,6 @@ class CreateJoinScene(MenuScene):
         MenuScene.__init__(self, self.menu)
 
     def update(self, surface, input):
-        self.render_surface.fill(self.colors['background'])
-
         self.handle_input(input)
 
         # update
@@ -806,10 +979,17 @@ class CreateJoinScene(MenuScene):
 
         self.handle_menu_actions()
 
-        # render stuff
-        self.menu.render(self.render_surface)
+        # render stuff, a menu only looks different after some input
+        if self.menu.dirty:
+            self.render_surface.fill(self.colors['background'])
+            self.menu.render(self.render_surface)
 
-        surface.blit(self.render_surface, (0, 0))
+            surface.blit(self.render_surface, (0, 0))
+
+            self.menu.dirty = False
+            self.dirty_rects = None
+        else:
+            self.dirty_rects = []
 
     def handle_menu_actions(self):
         if self.menu.get_pressed('join'):
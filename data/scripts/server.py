@@ -0,0 +1,489 @@
+import threading, json, random, time, itertools, math
+from . import player, bullet, map, interest, connection, world, lag_compensation, recording
+from .logger import log, INFO, WARNING
+from socket import AF_INET, socket, SOCK_STREAM, SOCK_DGRAM, SHUT_RDWR, timeout
+
+STATUS_QUERY = b'status'
+
+
+def query_status(address, match=None, timeout_seconds=1):
+    # asks a host for its session info over udp without joining, raises OSError if nobody answers
+    status_socket = socket(AF_INET, SOCK_DGRAM)
+    status_socket.settimeout(timeout_seconds)
+    try:
+        status_socket.sendto(STATUS_QUERY + (b' ' + bytes(match, 'utf8') if match else b''), address)
+        data, _ = status_socket.recvfrom(65536)
+    finally:
+        status_socket.close()
+
+    try:
+        return json.loads(data)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise OSError(f'{address[0]}:{address[1]} answered with something that is not a status') from e
+
+
+class HostSession:
+    def __init__(self, port: int, path, name, teams, compression='zlib', record=None):
+        self.name = name
+        self.teams = teams
+
+        # offered to every client that asks for it in its hello, None turns it off
+        self.compression = compression
+        self.compression_threshold = 256
+
+        # compression stats of the connections that are already gone, so the session summary still counts them
+        self.closed_compression = {'clients': 0, 'messages': 0, 'compressed_messages': 0, 'raw_bytes': 0, 'sent_bytes': 0, 'cpu_seconds': 0}
+        self.hello_timeout = .5
+
+        self.map_path = path
+        self.interest = interest.InterestManager(self.map)
+        self.message_splitter = ''.join(chr(random.randint(33, 126)) for _ in range(10))
+
+        self.spawn = (4 * 32, 3 * 32)
+        self.tick = 0
+
+        # hits are decided here against where the shooter saw their target, not reported by the victims
+        self.lag_compensation = lag_compensation.LagCompensator()
+        self.rtt = {}
+        self.ping_interval = 1
+        self.last_ping = 0
+
+        # every snapshot and event of the match goes to this file if a path is given
+        self.recorder = None
+        if record:
+            self.recorder = recording.Recorder(record, {'map': path, 'name': name, 'teams': teams, 'started': time.time()})
+        self.recorded_events = []
+
+        # clients join over the network, players in this process are there from the start. a session is named after its host
+        for player_id, p in self.local_players().items():
+            self.record_event(['join', player_id, name, p.team])
+
+        # the client threads only write into this buffer, the game loop applies it once per tick
+        self.world = world.WorldBuffer()
+
+        self.clients = {}
+        self.connections = {}
+        self.addresses = {}
+        # player ids by client socket and remote players by id, ids are never reused during a session
+        self.player_dictionary = {}
+        self.players = {}
+        self.player_ids = itertools.count(len(self.local_players()))
+
+        self.ip = ''
+        self.port = port
+        self.buffer_size = 1024
+        self.address = (self.ip, self.port)
+
+        # answers status queries on the same port number over udp, from a cache that only changes on joins and leaves
+        self.status = b''
+        self.update_status()
+
+        # without a port the clients are handed over by a match host
+        self.server = None
+        self.status_socket = None
+        if port is not None:
+            self.server = socket(AF_INET, SOCK_STREAM)
+            self.server.bind(self.address)
+
+            self.server.listen()
+
+            self.accept_thread = threading.Thread(target=self.accept_new_connections)
+            self.accept_thread.start()
+
+            self.status_socket = socket(AF_INET, SOCK_DGRAM)
+            self.status_socket.bind(self.address)
+            self.status_socket.settimeout(.5)
+
+            self.status_thread = threading.Thread(target=self.answer_status_queries, daemon=True)
+            self.status_thread.start()
+
+    def local_players(self):
+        # players that live in this process by their id
+        return {}
+
+    def all_players(self):
+        return {**self.local_players(), **self.players}
+
+    def player_states(self, new_bullets=True):
+        return [[player_id, p.center, p.rotation, p.active_weapon, p.frame, p.get_new_bullets() if new_bullets else [], p.team, p.hearts] for player_id, p in self.all_players().items()]
+
+    def update_status(self):
+        status = {
+            'name': self.name,
+            'teams': self.teams,
+            'names': [n for n in self.clients.values()],
+            'map': self.map_path,
+            'players': len(self.all_players())
+        }
+        self.status = bytes(json.dumps(status), 'utf8')
+
+    def answer_status_queries(self):
+        while True:
+            try:
+                data, address = self.status_socket.recvfrom(self.buffer_size)
+            except timeout:
+                continue
+            except OSError:
+                break
+
+            # a match name after the query only means something to a match host
+            if data.split(b' ', 1)[0] == STATUS_QUERY:
+                try:
+                    self.status_socket.sendto(self.status, address)
+                except OSError as e:
+                    log(f'could not answer the status query of {address[0]}:{address[1]}', WARNING)
+                    log(e, WARNING)
+
+    def accept_new_connections(self):
+        while True:
+            try:
+                client, client_address = self.server.accept()
+                log(f'{client_address[0]}:{client_address[1]} has connected', INFO)
+                self.addresses[client] = client_address
+
+                threading.Thread(target=self.handle_client, args=(client,)).start()
+            except OSError:
+                break
+
+    def handle_client(self, client, hello=None):
+        player_id = next(self.player_ids)
+
+        # a match host already read the hello to find the match of this client
+        if hello is None:
+            try:
+                hello = connection.receive_hello(client, self.hello_timeout, self.buffer_size)
+            except OSError:
+                log(f'{self.addresses[client]} lost connection during the handshake', WARNING)
+                del self.addresses[client]
+                client.close()
+                return
+
+        compressor = None
+        if self.compression and self.compression in hello.get('compression', []):
+            compressor = connection.Compressor(self.compression_threshold)
+
+        info = {
+            'name': self.name,
+            'teams': self.teams,
+            'names': [n for n in self.clients.values()],
+            'map': self.map_path,
+            'message_splitter': self.message_splitter,
+            'own_id': player_id,
+            'compression': self.compression if compressor else None,
+            'players': [[i, center, rotation, weapon, frame, team, hearts] for i, center, rotation, weapon, frame, _, team, hearts in self.interest.filter_players(self.spawn, self.player_states(False))]
+        }
+
+        connection.send_handshake(client, bytes(json.dumps(info), 'utf8'), compressor)
+
+        client_session_info = client.recv(self.buffer_size).decode('utf8')
+
+        if client_session_info == 'ping' or client_session_info == '':
+            log(f'got ping request from {self.addresses[client]}')
+            del self.addresses[client]
+            client.close()
+            return
+
+        client_session_info, _, rest = client_session_info.partition(self.message_splitter)
+        client_session_info = json.loads(client_session_info)
+
+        new_player = player.RemotePlayer(self.map, client_session_info['team'], self.bullets, player_id)
+        client_connection = connection.Connection(client, self.addresses[client], compressor=compressor)
+        self.connections[client] = client_connection
+        self.world.post(('join', client, player_id, new_player, client_session_info['name']))
+
+        # the first updates of the client can come in with its session info
+        reader = connection.MessageReader(self.message_splitter, client_connection.stats)
+        messages = reader.feed(bytes(rest, 'utf8'))
+
+        while True:
+            for message in messages:
+                try:
+                    client_info = json.loads(message)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    client_connection.stats.decode_error()
+                    log(f'Error receiving data from {self.addresses[client]}', WARNING)
+                    log(message)
+                    log(e, WARNING)
+                    continue
+
+                if 'player' in client_info:
+                    if client_info['player']['bullets']:
+                        self.world.post(('bullets', client, client_info['player']['bullets'], client_info['player']['weapon']))
+                    self.world.stage(client, client_info['player'])
+
+                # the client measures its own round trip time, answer right away
+                if 'ping' in client_info:
+                    self.send(client, self.build_message({'pong': client_info['ping']}))
+
+                if 'pong' in client_info:
+                    rtt = time.time() - client_info['pong']
+                    client_connection.stats.add_rtt(rtt)
+                    self.world.post(('rtt', client, rtt))
+
+            try:
+                msg = client.recv(self.buffer_size)
+                if msg == b'':
+                    raise ConnectionResetError('connection closed by client')
+
+            except OSError as e:
+                log('connection failed', WARNING)
+                #log(e)
+                self.world.post(('leave', client, player_id))
+                log(f'{self.addresses[client]} lost connection', INFO)
+                break
+
+            messages = reader.feed(msg)
+
+            # quit is the only message without a splitter, so it stays in the reader
+            if reader.buffer == bytes("{quit}", "utf8"):
+                self.world.post(('leave', client, player_id))
+                log(f'{self.addresses[client]} disconnected', INFO)
+                break
+
+    def apply_network_state(self):
+        state = self.world.swap()
+
+        for event in state.events:
+            if event[0] == 'join':
+                _, client, player_id, new_player, name = event
+                self.players[player_id] = new_player
+                self.player_dictionary[client] = player_id
+                self.clients[client] = name
+                self.record_event(['join', player_id, name, new_player.team])
+                self.update_status()
+
+            elif event[0] == 'leave':
+                _, client, player_id = event
+                self.remove_client(client, player_id)
+
+            elif event[0] == 'bullets':
+                _, client, bullets, weapon = event
+                p = self.players.get(self.player_dictionary.get(client))
+                # hits are decided here, so speed and damage come from the weapon and not from the client
+                if p and weapon in player.WEAPON_BULLETS:
+                    speed, damage = player.WEAPON_BULLETS[weapon]
+                    for bullet_id, direction, center, _, _ in bullets:
+                        length = math.hypot(direction[0], direction[1])
+                        if length:
+                            p.add_bullet(bullet_id, (direction[0] / length, direction[1] / length), center, speed, damage, True)
+
+            elif event[0] == 'rtt':
+                _, client, rtt = event
+                player_id = self.player_dictionary.get(client)
+                if player_id is not None:
+                    # smooth it out, a single slow pong shouldn't move every hit of that player
+                    old_rtt = self.rtt.get(player_id)
+                    self.rtt[player_id] = rtt if old_rtt is None else old_rtt * .8 + rtt * .2
+
+        for client, player_info in state.states.items():
+            p = self.players.get(self.player_dictionary.get(client))
+            if p:
+                p.set_center(player_info['center'])
+                p.set_rotation(player_info['rotation'])
+                p.set_image(player_info['weapon'], player_info['frame'])
+
+    def remove_client(self, client, player_id):
+        self.lag_compensation.forget(player_id)
+        self.rtt.pop(player_id, None)
+
+        self.bullets.remove_owner(player_id)
+        if self.players.pop(player_id, None):
+            self.record_event(['leave', player_id])
+            disconnection_info = {'disconnect': player_id}
+            self.broadcast(self.build_message(disconnection_info))
+
+        client_connection = self.connections.pop(client)
+        client_connection.close()
+        if client_connection.compressor:
+            stats = client_connection.compressor.stats()
+            self.closed_compression['clients'] += 1
+            for key in ('messages', 'compressed_messages', 'raw_bytes', 'sent_bytes', 'cpu_seconds'):
+                self.closed_compression[key] += stats[key]
+        client.close()
+        self.clients.pop(client, None)
+        self.player_dictionary.pop(client, None)
+        self.update_status()
+
+    def record_positions(self):
+        timestamp = time.time()
+        for player_id, p in self.all_players().items():
+            self.lag_compensation.record(player_id, p, timestamp)
+
+    def resolve_hits(self):
+        now = time.time()
+        players = self.all_players()
+        local_players = self.local_players()
+
+        damage_dealt = []
+        hit_rows = []
+        rewind_times = {}
+
+        for row, (shooter_id, bullet_id), position, bullet_damage in self.bullets.damaging():
+            shooter = players.get(shooter_id)
+            if shooter is None:
+                continue
+
+            if shooter_id not in rewind_times:
+                # players in this process see everybody else without any delay
+                rewind_times[shooter_id] = self.lag_compensation.rewind_time(None if shooter_id in local_players else self.rtt.get(shooter_id, 0), now)
+
+            for victim_id, victim in players.items():
+                if victim_id == shooter_id:
+                    continue
+
+                if self.lag_compensation.hit(victim_id, position, self.bullets.mask, rewind_times[shooter_id]):
+                    # team mates still stop the bullet, they just don't lose any hearts
+                    damage = bullet_damage if victim.team != shooter.team else 0
+                    victim.hearts -= damage
+                    damage_dealt.append([shooter_id, bullet_id, damage, victim_id])
+                    hit_rows.append(row)
+                    break
+
+        self.bullets.remove_rows(hit_rows)
+
+        if damage_dealt:
+            self.record_event(['damage', damage_dealt])
+            self.broadcast(self.build_message({'damage': damage_dealt}))
+
+    def record_event(self, event):
+        if self.recorder:
+            self.recorded_events.append(event)
+
+    def send_pings(self):
+        timestamp = time.time()
+        if timestamp - self.last_ping < self.ping_interval:
+            return
+
+        self.last_ping = timestamp
+        self.broadcast(self.build_message({'ping': timestamp}))
+
+    def build_message(self, message: dict):
+        return json.dumps(message) + self.message_splitter
+
+    def send_players(self, players):
+        timestamp = time.time()
+        self.tick += 1
+        for client, player_id in list(self.player_dictionary.items()):
+            viewer = self.players.get(player_id)
+            if not viewer:
+                continue
+
+            info = {
+                'players': self.interest.filter_players(viewer.center, players, player_id),
+                'tick': self.tick,
+                'time': timestamp
+            }
+
+            # snapshots that spawn bullets can't be replaced by a newer one without losing those bullets
+            droppable = not any(p[5] for p in info['players'])
+            self.send(client, self.build_message(info), droppable)
+
+        if self.recorder:
+            self.recorder.record(self.tick, timestamp, players, self.recorded_events)
+            self.recorded_events = []
+
+    def send(self, client, message: str, droppable=False):
+        client_connection = self.connections.get(client)
+        if client_connection:
+            client_connection.send(bytes(message, 'utf8'), droppable)
+
+    def broadcast(self, message: str):  # prefix is for name identification.
+        message_bytes = bytes(message, 'utf8')
+        for client_connection in list(self.connections.values()):
+            client_connection.send(message_bytes)
+
+    def compression_stats(self):
+        # the whole session, connections that left plus the ones still open
+        stats = [c.compressor.stats() for c in list(self.connections.values()) if c.compressor]
+        closed = self.closed_compression
+
+        raw_bytes = closed['raw_bytes'] + sum(s['raw_bytes'] for s in stats)
+        sent_bytes = closed['sent_bytes'] + sum(s['sent_bytes'] for s in stats)
+        return {
+            'clients': closed['clients'] + len(stats),
+            'messages': closed['messages'] + sum(s['messages'] for s in stats),
+            'compressed_messages': closed['compressed_messages'] + sum(s['compressed_messages'] for s in stats),
+            'raw_bytes': raw_bytes,
+            'sent_bytes': sent_bytes,
+            'ratio': sent_bytes / raw_bytes if raw_bytes else 1,
+            'cpu_seconds': closed['cpu_seconds'] + sum(s['cpu_seconds'] for s in stats)
+        }
+
+    def network_stats(self):
+        stats = {}
+        for sock, c in list(self.connections.items()):
+            name = self.clients.get(sock, self.addresses.get(sock))
+            stats[name] = {
+                **c.stats.snapshot(),
+                'player_id': self.player_dictionary.get(sock),
+                'queue_depth': c.depth(),
+                'coalesced': c.coalesced
+            }
+        return stats
+
+    def queue_depths(self):
+        return {self.clients.get(sock, self.addresses.get(sock)): c.depth() for sock, c in list(self.connections.items())}
+
+    def stop(self):
+        log(f'compression: {self.compression_stats()}', INFO)
+
+        if self.recorder:
+            self.recorder.close()
+
+        for c in list(self.connections.values()):
+            c.close()
+        for sock in list(self.clients):
+            sock.close()
+
+        if self.server:
+            self.status_socket.close()
+
+            # closing alone does not wake up the accept thread on every platform
+            try:
+                self.server.shutdown(SHUT_RDWR)
+            except OSError:
+                pass
+            self.server.close()
+
+
+class DedicatedServer(HostSession):
+    def __init__(self, port: int, path, name, teams, tick_rate=60, compression='zlib', record=None):
+        self.map = map.Map(path)
+        self.bullets = bullet.Bullets(self.map)
+
+        HostSession.__init__(self, port, path, name, teams, compression, record)
+
+        self.tick_rate = tick_rate
+        self.running = True
+
+    def run(self):
+        tick_duration = 1 / self.tick_rate
+        next_tick = time.perf_counter()
+
+        while self.running:
+            self.update()
+
+            next_tick += tick_duration
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # we fell behind, don't try to catch up with a burst of ticks
+                next_tick = time.perf_counter()
+
+    def update(self):
+        self.apply_network_state()
+
+        for p in self.players.values():
+            p.update()
+        self.bullets.update()
+
+        self.record_positions()
+        self.resolve_hits()
+
+        self.send_pings()
+        self.send_players(self.player_states())
+
+    def stop(self):
+        self.running = False
+        HostSession.stop(self)
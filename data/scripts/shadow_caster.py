@@ -1,7 +1,22 @@
 import pygame
-from scipy import spatial
-from shapely import geometry, ops
 from threading import Thread
+from . import lazy
+
+# scipy and shapely take longer to import than everything else, they load once shadows are needed or the menu preloads them
+spatial = lazy.module('scipy.spatial')
+geometry = lazy.module('shapely.geometry')
+ops = lazy.module('shapely.ops')
+
+# resolution is the share of the screen size shadows are drawn at, smooth blends their edges when they are scaled up
+# and update interval is how many frames at least go by between two redraws while the player moves
+QUALITY_PRESETS = {
+    'high': {'resolution': 1, 'smooth': False, 'update_interval': 1},
+    'medium': {'resolution': .5, 'smooth': True, 'update_interval': 2},
+    'low': {'resolution': .25, 'smooth': True, 'update_interval': 4}
+}
+
+# used by every shadow caster that isn't given a quality, main.py sets it from the command line
+default_quality = 'high'
 
 
 class Shadow:
@@ -12,7 +27,7 @@ class Shadow:
 
 
 class ShadowCaster:
-    def __init__(self, player, map, shadow_color):
+    def __init__(self, player, map, shadow_color, quality=None, resolution=None, smooth=None, update_interval=None):
         self.player = player
         self.map = map
         self.render_width = 1024
@@ -25,15 +40,37 @@ class ShadowCaster:
             'red': (255, 0, 0)
         }
         
-        self.render_surface = pygame.Surface((self.render_width, self.render_height))
-        self.render_surface.set_colorkey(self.colors['black'])
+        preset = QUALITY_PRESETS[quality or default_quality]
+        self.resolution = preset['resolution'] if resolution is None else resolution
+        self.smooth = preset['smooth'] if smooth is None else smooth
+        self.update_interval = preset['update_interval'] if update_interval is None else update_interval
+
+        # shadows are drawn into the buffer and scaled up into the render surface, at full resolution they are the same one
+        buffer_size = (round(self.render_width * self.resolution), round(self.render_height * self.resolution))
+        if self.smooth:
+            # smoothed edges need real transparency, a colorkey would leave a dark fringe around them
+            self.render_surface = pygame.Surface((self.render_width, self.render_height), pygame.SRCALPHA)
+            self.buffer = pygame.Surface(buffer_size, pygame.SRCALPHA)
+            self.clear_color = (0, 0, 0, 0)
+        else:
+            self.render_surface = pygame.Surface((self.render_width, self.render_height))
+            self.render_surface.set_colorkey(self.colors['black'])
+            self.buffer = self.render_surface if self.resolution == 1 else pygame.Surface(buffer_size)
+            self.clear_color = self.colors['black']
 
         self.last_player_center = (0, 0)
+        self.frames_since_update = self.update_interval
+
+        # goes up every time the shadows are drawn again, so others know when their copy is out of date
+        self.version = 0
 
     def update(self, debug=False):
-        if (int(self.player.center[0]), int(self.player.center[1])) != self.last_player_center:
+        self.frames_since_update += 1
+        if (int(self.player.center[0]), int(self.player.center[1])) != self.last_player_center and self.frames_since_update >= self.update_interval:
             self.last_player_center = (int(self.player.center[0]), int(self.player.center[1]))
-            self.render_surface.fill(self.colors['black'])
+            self.frames_since_update = 0
+            self.buffer.fill(self.clear_color)
+            self.version += 1
 
             for wall in self.map.inside_walls:
                 nearest_point = list(ops.nearest_points(geometry.Point(self.player.center), wall.shapely)[1].coords)[0]
@@ -88,11 +125,11 @@ class ShadowCaster:
                     new_points.append(new_point)
 
                     if debug:
-                        pygame.draw.circle(self.render_surface, self.colors['red'], corner, 2)
-                        pygame.draw.circle(self.render_surface, self.colors['green'], new_point, 2)
+                        pygame.draw.circle(self.buffer, self.colors['red'], self.scale(corner), 2)
+                        pygame.draw.circle(self.buffer, self.colors['green'], self.scale(new_point), 2)
 
-                        pygame.draw.aaline(self.render_surface, self.colors['red'], self.player.center, corner)
-                        pygame.draw.aaline(self.render_surface, self.colors['green'], corner, new_point)
+                        pygame.draw.aaline(self.buffer, self.colors['red'], self.scale(self.player.center), self.scale(corner))
+                        pygame.draw.aaline(self.buffer, self.colors['green'], self.scale(corner), self.scale(new_point))
 
                 x_values = [i[0] for i in new_points]
                 y_values = [i[1] for i in new_points]
@@ -145,7 +182,17 @@ class ShadowCaster:
                 shadow_rect = pygame.Rect(x, y, width, height)
                 wall_shadows.append(Shadow(shadow_rect, shadow_shape))
 
-                pygame.draw.polygon(self.render_surface, self.colors['shadows'], shadow_shape)
+                pygame.draw.polygon(self.buffer, self.colors['shadows'], [self.scale(point) for point in shadow_shape])
+
+            if self.smooth:
+                pygame.transform.smoothscale(self.buffer, self.render_surface.get_size(), self.render_surface)
+            elif self.buffer is not self.render_surface:
+                pygame.transform.scale(self.buffer, self.render_surface.get_size(), self.render_surface)
+
+    def scale(self, point):
+        if self.resolution == 1:
+            return point
+        return point[0] * self.resolution, point[1] * self.resolution
 
     def render(self, surface):
         surface.blit(self.render_surface, (0, 0))
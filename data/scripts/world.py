@@ -0,0 +1,36 @@
+import threading
+
+
+class WorldState:
+    def __init__(self):
+        # latest state per key, a newer state simply replaces an older one
+        self.states = {}
+        # everything that has to be applied in order, like joins, bullets and damage
+        self.events = []
+
+    def clear(self):
+        self.states.clear()
+        self.events.clear()
+
+
+class WorldBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        self.front = WorldState()
+        self.back = WorldState()
+
+    def stage(self, key, state):
+        with self.lock:
+            self.back.states[key] = state
+
+    def post(self, event):
+        with self.lock:
+            self.back.events.append(event)
+
+    def swap(self):
+        # network threads only ever touch the back buffer, the game loop reads the front one
+        with self.lock:
+            self.front, self.back = self.back, self.front
+            self.back.clear()
+        return self.front
@@ -0,0 +1,33 @@
+import argparse
+from data.scripts import server, logger
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='run a CsLow session without a window')
+    parser.add_argument('--port', type=int, default=33000)
+    parser.add_argument('--map', default='data/maps/map_1.csv')
+    parser.add_argument('--teams', default='team 1, team 2', help='comma separated team names')
+    parser.add_argument('--name', default='server')
+    parser.add_argument('--tick-rate', type=int, default=60)
+    parser.add_argument('--log', default='data/logs/server.log')
+    parser.add_argument('--log-level', default='DEBUG', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--log-rate-limit', type=int, help='at most this many log lines per second from any one place')
+    parser.add_argument('--binary-log', action='store_true', help='write the log in the binary format, read it with read_log.py')
+    parser.add_argument('--record', help='write the match to this file, play it back with replay.py')
+    parser.add_argument('--no-compression', action='store_true', help='never compress messages, even if clients ask for it')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+    logger.setup(arguments.log, arguments.log_level, arguments.log_rate_limit, arguments.binary_log)
+
+    teams = [t.strip() for t in arguments.teams.split(',')]
+    if len(teams) < 2 or len(teams) != len(set(teams)) or '' in teams:
+        raise SystemExit('please enter at least 2 different team names')
+
+    session = server.DedicatedServer(arguments.port, arguments.map, arguments.name, teams, arguments.tick_rate, None if arguments.no_compression else 'zlib', arguments.record)
+    try:
+        session.run()
+    except KeyboardInterrupt:
+        session.stop()
@@ -0,0 +1,26 @@
+import argparse
+from data.scripts import bot
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='ramp up bot clients against a running CsLow host')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=33000)
+    parser.add_argument('--max-bots', type=int, default=32)
+    parser.add_argument('--step', type=int, default=4, help='bots added per stage')
+    parser.add_argument('--stage-duration', type=float, default=10, help='seconds per stage')
+    parser.add_argument('--send-rate', type=int, default=60, help='player updates per second and bot')
+    parser.add_argument('--fire-interval', type=float, default=.5, help='seconds between shots, 0 to never shoot')
+    parser.add_argument('--match', help='match to join on a match host, the first one if not given')
+    parser.add_argument('--no-compression', action='store_true', help='do not ask the host for compressed messages')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    test = bot.LoadTest((arguments.ip, arguments.port), arguments.max_bots, arguments.step, arguments.stage_duration, arguments.send_rate, arguments.fire_interval, not arguments.no_compression, arguments.match)
+    try:
+        test.run()
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,10 @@
+import argparse, datetime, time
+started = time.perf_counter()
+
 import pygame
-from data.scripts import scene
+from data.scripts import scene, fonts, shadow_caster, hud, logger
+from data.scripts.logger import log, INFO
+from data.scripts.profiling import profiler
 
 
 class Game:
@@ -21,13 +26,22 @@ class Game:
         self.render_width, self.render_height = 1024, 576
         self.render_dimensions = (self.render_width, self.render_height)
 
-        self.font = pygame.font.Font('data/font/font.ttf', 15)
+        self.text_cache = fonts.get('data/font/font.ttf', 15)
         self.screen = pygame.display.set_mode(self.screen_dimensions)
         self.clock = pygame.time.Clock()
         self.render_surface = pygame.Surface(self.render_dimensions)
 
         self.input = []
 
+        # only push the parts of the screen that changed, when the scene can tell which ones did
+        self.dirty_rendering = True
+
+        # what the fps text and the overlays were drawn over, scenes that didn't change don't draw over them again
+        self.covered = []
+
+        # F4 times every phase of a frame and shows a frame time graph, F5 saves the recorded frames as a chrome trace
+        self.profiler_overlay = hud.ProfilerOverlay()
+
         '''mode = input('Mode: ')
         if mode == '1':
             self.main_scene = scene.HostScene('data/maps/map_1.csv')
@@ -44,16 +58,48 @@ class Game:
         self.active_scene = scene.MainMenuScene()
 
     def run(self):
+        global started
         while self.running:
             self.clock.tick(self.fps)
+            profiler.start_frame()
+
+            with profiler.phase('input'):
+                self.handle_input()
+
+            # take last frame's fps text and overlays off again
+            last_rects = [rect for _, rect in self.covered]
+            for background, rect in reversed(self.covered):
+                self.render_surface.blit(background, rect)
+            self.covered = []
+
+            with profiler.phase('scene'):
+                self.active_scene.update(self.render_surface, self.input)
 
-            self.handle_input()
+            rects = [self.draw_over_scene(self.text_cache.render('fps: ' + str(round(self.clock.get_fps(), 2)), self.colors['text']), (5, 5))]
 
-            self.active_scene.update(self.render_surface, self.input)
+            if profiler.enabled:
+                self.profiler_overlay.update(profiler)
+                if self.profiler_overlay.overlay_render:
+                    overlay = self.profiler_overlay.overlay_render
+                    rects.append(self.draw_over_scene(overlay, (self.render_width / 2 - overlay.get_width() / 2, 5)))
 
-            self.render_surface.blit(self.font.render('fps: ' + str(round(self.clock.get_fps(), 2)), True, self.colors['text']), (5, 5))
-            self.screen.blit(pygame.transform.scale(self.render_surface, self.screen_dimensions), (0, 0))
-            pygame.display.update()
+            with profiler.phase('present'):
+                dirty_rects = getattr(self.active_scene, 'dirty_rects', None)
+                if self.dirty_rendering and dirty_rects is not None and self.render_dimensions == self.screen_dimensions:
+                    rects = dirty_rects + rects + last_rects
+
+                    for rect in rects:
+                        self.screen.blit(self.render_surface, rect, rect)
+                    pygame.display.update(rects)
+                else:
+                    self.screen.blit(pygame.transform.scale(self.render_surface, self.screen_dimensions), (0, 0))
+                    pygame.display.update()
+
+            profiler.end_frame()
+
+            if started is not None:
+                log(f'first frame after {(time.perf_counter() - started) * 1000:.0f} ms', INFO)
+                started = None
 
             if self.active_scene.next_scene:
                 self.active_scene = self.active_scene.next_scene
@@ -75,8 +121,35 @@ class Game:
                 if event.key == pygame.K_ESCAPE:
                     self.active_scene.stop()
                     self.running = False
+                elif event.key == pygame.K_F4:
+                    profiler.toggle()
+                elif event.key == pygame.K_F5:
+                    self.export_trace()
+
+    def draw_over_scene(self, image, position):
+        rect = image.get_rect(topleft=position).clip(self.render_surface.get_rect())
+        self.covered.append((self.render_surface.subsurface(rect).copy(), rect))
+        self.render_surface.blit(image, position)
+        return rect
+
+    def export_trace(self):
+        path = f'data/logs/trace_{datetime.datetime.now():%Y%m%d_%H%M%S}.json'
+        frames = profiler.export_chrome_trace(path)
+        log(f'saved {frames} profiled frames to {path}', INFO)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='play CsLow')
+    parser.add_argument('--shadows', choices=list(shadow_caster.QUALITY_PRESETS), default='high', help='lower shadow quality for more frames on slow machines')
+    parser.add_argument('--log-level', default='DEBUG', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--log-rate-limit', type=int, help='at most this many log lines per second from any one place')
+    parser.add_argument('--binary-log', action='store_true', help='write the log in the binary format, read it with read_log.py')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
+    arguments = parse_arguments()
+    logger.setup(level=arguments.log_level, rate_limit=arguments.log_rate_limit, binary=arguments.binary_log)
+    shadow_caster.default_quality = arguments.shadows
     app = Game()
     app.run()
@@ -0,0 +1,36 @@
+import argparse, signal
+from data.scripts import matches, logger
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='run several CsLow matches on one port, each in its own process')
+    parser.add_argument('--port', type=int, default=33000)
+    parser.add_argument('--match', action='append', help='name of a match, can be given several times')
+    parser.add_argument('--map', default='data/maps/map_1.csv')
+    parser.add_argument('--teams', default='team 1, team 2', help='comma separated team names')
+    parser.add_argument('--tick-rate', type=int, default=60)
+    parser.add_argument('--log', default='data/logs/match_host.log')
+    parser.add_argument('--no-compression', action='store_true', help='never compress messages, even if clients ask for it')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+    logger.setup(arguments.log)
+
+    teams = [t.strip() for t in arguments.teams.split(',')]
+    if len(teams) < 2 or len(teams) != len(set(teams)) or '' in teams:
+        raise SystemExit('please enter at least 2 different team names')
+
+    names = arguments.match or ['match 1', 'match 2']
+    if len(names) != len(set(names)):
+        raise SystemExit('match names have to be different')
+
+    host = matches.MatchHost(arguments.port, {name: (arguments.map, teams) for name in names}, arguments.tick_rate, None if arguments.no_compression else 'zlib')
+    # stop the matches cleanly when the host is terminated, not only on ctrl+c
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        host.run()
+    except KeyboardInterrupt:
+        pass
+    host.stop()
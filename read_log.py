@@ -0,0 +1,19 @@
+import argparse, datetime
+from data.scripts import logger
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='print a binary CsLow log as text')
+    parser.add_argument('path')
+    parser.add_argument('--level', default='DEBUG', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='leave out everything below this level')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+    levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+
+    for created, level, message in logger.read_binary(arguments.path):
+        if level in levels and levels.index(level) < levels.index(arguments.level):
+            continue
+        print(f'{datetime.datetime.fromtimestamp(created):%d.%m.%y %H:%M:%S} {level}: {message}')
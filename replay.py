@@ -0,0 +1,60 @@
+import argparse, datetime
+import pygame
+from data.scripts import scene, recording, logger
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='play back or inspect a recorded CsLow match')
+    parser.add_argument('path', nargs='?', default='data/recordings/match.rec')
+    parser.add_argument('--tick', type=int, help='start playing at this tick')
+    parser.add_argument('--info', action='store_true', help='print a summary of the recording instead of playing it')
+    return parser.parse_args()
+
+
+def print_info(path):
+    replay = recording.Replay(path)
+    print(f'map: {replay.metadata.get("map")}, host: {replay.metadata.get("name")}, teams: {", ".join(replay.metadata.get("teams", []))}')
+    if 'started' in replay.metadata:
+        print(f'started: {datetime.datetime.fromtimestamp(replay.metadata["started"]):%Y-%m-%d %H:%M:%S}')
+
+    if len(replay):
+        first_tick, first_time, _, _ = replay.entry(0)
+        last_tick, last_time, _, _ = replay.entry(len(replay) - 1)
+        print(f'ticks: {first_tick} - {last_tick} ({len(replay)} recorded), duration: {last_time - first_time:.1f}s')
+    else:
+        print('the recording is empty')
+
+    replay.close()
+
+
+def play(path, tick):
+    pygame.init()
+    pygame.display.set_caption('CsLow: Replay')
+    screen = pygame.display.set_mode((1024, 576))
+    clock = pygame.time.Clock()
+
+    replay_scene = scene.ReplayScene(path, tick)
+
+    running = True
+    while running:
+        clock.tick(120)
+
+        events = pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+
+        replay_scene.update(screen, events)
+        pygame.display.update()
+
+    replay_scene.stop()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+    logger.setup('data/logs/replay.log')
+
+    if arguments.info:
+        print_info(arguments.path)
+    else:
+        play(arguments.path, arguments.tick)